@@ -0,0 +1,3 @@
+# St. Louis Neighborhoods and tracts
+# maps and videos of the St. Louis census tracts, run as scripts from this directory or as
+# python -m StLouis render <config> (see __main__.py)
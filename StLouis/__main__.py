@@ -0,0 +1,102 @@
+# St. Louis Neighborhoods and tracts
+# command line of the package
+#   python -m StLouis render [config.toml|config.yaml] [--set KEY=VALUE] [--check] [--preview]
+# the settings (render_config.default_config) come from the config file and --set, so a sweep
+# of renders only needs one config file per render or one --set per changed setting
+# the modules import each other by name like the scripts, so this directory goes on the path
+# and the render runs in it (video/ and the video_file are relative to it like in the scripts)
+# --help and --check only import the config module, nothing of numpy, pandas or matplotlib
+
+
+############################
+## Imports
+############################
+
+import argparse
+import json
+import sys
+import os
+
+package_dir = os.path.dirname(os.path.abspath(__file__))
+if package_dir not in sys.path:
+	sys.path.insert(0, package_dir)
+
+from render_config import load_config
+
+
+############################
+## Functions
+############################
+
+# parser and arguments of the command line (the render command)
+def parse_args(argv=None):
+
+	parser = argparse.ArgumentParser(prog='python -m StLouis',
+			description='Maps and videos of the St. Louis census tracts')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	render = commands.add_parser('render', help='render a video from a config file',
+			description='Render a video of a demographic variable from a TOML or YAML config, '
+			'settings not in the config keep the defaults of render_config.default_config')
+	render.add_argument('config', nargs='?', default=None,
+			help='TOML (.toml), YAML (.yaml) or json file with the settings, none for the defaults')
+	render.add_argument('--set', dest='settings', action='append', default=[], metavar='KEY=VALUE',
+			help='change a setting of the config, the value is read as json, '
+			'e.g. --set workers=8 --set years=[1940,1950] --set output=png')
+	render.add_argument('--check', action='store_true',
+			help='only check the config and print the settings of the render')
+	render.add_argument('--preview', action='store_true',
+			help='show the frames in a window while drawing them (slow, one worker only)')
+	render.add_argument('--restart', action='store_true',
+			help='start the render again from the first frame instead of resuming')
+	render.add_argument('--report', default=None,
+			help='json file for the run report, default cache/reports/<config>_<time>.json')
+	render.add_argument('--profile', action='store_true',
+			help='profile the stages with cProfile and save the profile of the slowest one next to the report')
+
+	return parser, parser.parse_args(argv)
+
+
+# render a video from the command line, returns the exit code
+def main(argv=None):
+
+	parser, args = parse_args(argv)
+
+	try:
+		config = load_config(args.config, args.settings)
+	except (ValueError, RuntimeError, OSError) as err:
+		parser.exit(2, 'error: ' + str(err) + '\n')
+
+	if args.check:
+		print(json.dumps(config, indent=1))
+		return 0
+
+	# paths from the command line are relative to where it was run
+	report_file = args.report
+	if report_file is not None:
+		report_file = os.path.abspath(report_file)
+
+	name = 'render'
+	if args.config is not None:
+		name = os.path.abspath(args.config)
+
+	os.chdir(package_dir)
+
+	# matplotlib is imported by render_video once there are frames to draw
+	from run_report import start_report, write_report
+	from video_pipeline import render_video
+
+	start_report(profile=args.profile)
+	render_video(config, preview=args.preview, restart=args.restart)
+	write_report(name, report_file)
+
+	return 0
+
+
+############################
+## Main
+############################
+
+if __name__ == '__main__':
+
+	sys.exit(main())
@@ -0,0 +1,88 @@
+# St. Louis Neighborhoods and tracts
+# area weighted interpolation of tract counts (population, white, black, ...) onto the boxes
+# every tract count is split between the boxes by the share of the tract area in each box
+# the same overlay of two sets of polygons gives the crosswalk between tract vintages
+# (e.g. the 1970 tracts onto the 2010 tracts)
+# a target outside every source gets counts of 0, so its rates (0 / 0 people) are NaN and the
+# box is drawn empty in every frame next to that year (timeline.build_timeline)
+# areas are in square degrees, the shares of a tract are the same as in any local projection
+# at the size of the city
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+import shapely
+from scipy.sparse import csr_matrix
+
+
+############################
+## Functions
+############################
+
+# area of every overlap between the target and source polygons as (target, source, area)
+# arrays, only the pairs with an overlap of more than 0
+# the pairs come from an STRtree of the sources, targets fully inside a source (most boxes)
+# keep their own area and only the targets crossing a source boundary are intersected
+def overlap_areas(target_geoms, source_geoms):
+
+	target_geoms = np.asarray(target_geoms)
+	source_geoms = np.asarray(source_geoms)
+
+	tree = shapely.STRtree(source_geoms)
+	target_ind, source_ind = tree.query(target_geoms, predicate='intersects')
+
+	shapely.prepare(source_geoms)
+	inside = shapely.contains_properly(source_geoms[source_ind], target_geoms[target_ind])
+
+	areas = shapely.area(target_geoms[target_ind])
+	crossing = ~inside
+	areas[crossing] = shapely.area(shapely.intersection(target_geoms[target_ind[crossing]],
+			source_geoms[source_ind[crossing]]))
+
+	keep = areas > 0
+
+	return target_ind[keep], source_ind[keep], areas[keep]
+
+
+# sparse (targets x sources) matrix of the share of each source polygon's area in each target
+# counts of the sources move onto the targets with areal_interpolate, a source partly outside
+# every target loses the count of the part outside
+def areal_weight_matrix(target_geoms, source_geoms):
+
+	source_geoms = np.asarray(source_geoms)
+	target_ind, source_ind, areas = overlap_areas(target_geoms, source_geoms)
+
+	shares = areas / shapely.area(source_geoms)[source_ind]
+
+	return csr_matrix((shares, (target_ind, source_ind)), shape=(len(target_geoms), len(source_geoms)))
+
+
+# counts of the targets from the counts of the sources (one value per source, or a
+# (sources, columns) array), missing (NaN) counts add nothing
+def areal_interpolate(weights, counts):
+
+	counts = np.asarray(counts, dtype=float)
+
+	return weights @ np.where(np.isnan(counts), 0.0, counts)
+
+
+# sparse (target tracts x source tracts) crosswalk between two tract vintages, the share of
+# each source tract in each target tract
+def tract_crosswalk(source_data, target_data):
+
+	return areal_weight_matrix(np.asarray(target_data['geometry'].values), np.asarray(source_data['geometry'].values))
+
+
+# count columns (e.g. ['population', 'white']) of source_data moved onto the tracts of
+# target_data by the crosswalk, as a DataFrame with the index of target_data
+def crosswalk_counts(source_data, target_data, columns):
+
+	import pandas as pd
+
+	weights = tract_crosswalk(source_data, target_data)
+	counts = areal_interpolate(weights, source_data[columns].values)
+
+	return pd.DataFrame(counts, index=target_data.index, columns=columns)
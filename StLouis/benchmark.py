@@ -0,0 +1,456 @@
+# St. Louis Neighborhoods and tracts
+# benchmarks of the grid, interpolation and rendering steps of the videos
+# cold starts of the command line are timed in a new python process each time
+# every run is appended to cache/benchmark_results.jsonl with the git commit and versions, so a
+# slow down between versions shows up as the change against the previous run
+# python benchmark.py [--quick] [--only idw] [--no-save]
+
+
+############################
+## Imports
+############################
+
+import matplotlib
+matplotlib.use('Agg')
+
+import numpy as np
+import shapely
+import subprocess
+import tempfile
+import functools
+import argparse
+import shutil
+import platform
+import time
+import json
+import sys
+import io
+import os
+from data_loader import read_geo_csv, load_year
+from interpolation import centroid_xy, idw_weight_matrix, apply_weights
+from spatial_index import build_centroid_index, assign_points_to_tracts
+from areal_interpolation import areal_weight_matrix
+from box_grid import box_grid, raster_grid, load_grid, grid_xy
+from year_values import preprocess_years
+from timeline import stack_years, frame_times, build_timeline, timeline_values
+from render import load_map_layers, setup_figure, render_chunk, open_video, close_video, video_dpi
+
+
+############################
+## Constants
+############################
+
+# the results stay with the other cached data, out of the git tree
+package_dir = os.path.dirname(os.path.abspath(__file__))
+results_file = os.path.join(package_dir, 'cache', 'benchmark_results.jsonl')
+
+# real fixtures, the committed box grids and a census year with each tract vintage
+grid_files = ['boundaries25.csv', 'boundaries201.csv']
+bench_years = ['1940', '2018']
+
+# synthetic fixture, random boxes and tracts over the city bounds (fine grid sizes)
+synthetic_boxes = 100000
+synthetic_tracts = 500
+
+# frames of the temporal interpolation and encode benchmarks
+bench_frames = 100
+
+# years and variables of the box value benchmarks, the years of the videos
+video_years = ['1930','1940','1950','1960','1970','1980','1990','2000',
+		'2010','2011','2012','2013','2014','2015','2016','2017','2018']
+bench_variables = ['white', 'black', 'people of color', 'median income per household', 'income per capita']
+
+
+############################
+## Functions
+############################
+
+# time func repeat times (after one warm up call), returns the times in seconds
+def time_func(func, repeat):
+
+	func()
+
+	times = []
+	for ind in range(repeat):
+		start = time.perf_counter()
+		func()
+		times.append(time.perf_counter() - start)
+
+	return times
+
+
+# run python with args in a new process from cwd, the cold start of a command
+def cold_start(args, cwd):
+
+	subprocess.run([sys.executable] + args, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+
+
+# city boundary polygon
+@functools.lru_cache(maxsize=None)
+def city_boundary():
+
+	return read_geo_csv('stl_boundary.csv', 'Name').loc['STL_boundary'].geometry
+
+
+# random points inside the bounds of the city, the same for every run
+def synthetic_xy(num_points, seed):
+
+	lon1, lat1, lon2, lat2 = city_boundary().bounds
+	rng = np.random.default_rng(seed)
+
+	return np.column_stack([rng.uniform(lon1, lon2, num_points), rng.uniform(lat1, lat2, num_points)])
+
+
+# synthetic tracts as a grid of squares over the city bounds
+def synthetic_tracts_geoms(num_tracts):
+
+	lon1, lat1, lon2, lat2 = city_boundary().bounds
+	side = int(np.ceil(np.sqrt(num_tracts)))
+
+	lons = np.linspace(lon1, lon2, side+1)
+	lats = np.linspace(lat1, lat2, side+1)
+	lon_lo, lat_lo = np.meshgrid(lons[:-1], lats[:-1], indexing='ij')
+	lon_hi, lat_hi = np.meshgrid(lons[1:], lats[1:], indexing='ij')
+
+	return shapely.box(lon_lo.ravel(), lat_lo.ravel(), lon_hi.ravel(), lat_hi.ravel())
+
+
+## fixtures, made by the first case that needs them and shared by the later ones
+
+# boxes of a committed grid file and their centers
+@functools.lru_cache(maxsize=None)
+def grid_fixture(grid_file):
+
+	boxes_data = read_geo_csv(grid_file, 'boundaries')
+
+	return boxes_data, centroid_xy(boxes_data)
+
+
+# tracts of a census year, their polygons and centers
+@functools.lru_cache(maxsize=None)
+def tract_fixture(year):
+
+	data = load_year(year)
+
+	return data, np.asarray(data['geometry'].values), centroid_xy(data)
+
+
+# random boxes and square tracts over the city bounds
+@functools.lru_cache(maxsize=None)
+def synthetic_fixture():
+
+	tract_geoms = synthetic_tracts_geoms(synthetic_tracts)
+
+	return synthetic_xy(synthetic_boxes, 1), tract_geoms, shapely.get_coordinates(shapely.centroid(tract_geoms))
+
+
+# random box values of three years, the frame times of the first decade
+@functools.lru_cache(maxsize=None)
+def timeline_fixture():
+
+	rng = np.random.default_rng(2)
+	year_colors = {'1930': rng.random(synthetic_boxes), '1940': rng.random(synthetic_boxes),
+			'1950': rng.random(synthetic_boxes)}
+	times, matrix = stack_years(['1930', '1940', '1950'], year_colors)
+
+	return times, matrix, frame_times(times, frames_per_year=bench_frames/10.0)[0]
+
+
+# figure with a first frame of the 2018 values drawn on a grid, the drawing state of that
+# frame and a second frame of the same year that only recolors the boxes
+@functools.lru_cache(maxsize=None)
+def render_fixture(grid_file):
+
+	map_layers = load_map_layers()
+	data, tract_geoms, tract_xy = tract_fixture('2018')
+
+	grid = load_grid(grid_file)
+	xy = grid_xy(grid)
+	vals = apply_weights(idw_weight_matrix(xy, tract_xy, index=build_centroid_index(tract_xy)),
+			data['dem_color'].values).astype(np.float32)
+
+	fig1, ax1 = setup_figure('% Population White')
+	state = {}
+	chunk = {'frame': 1, 'year': '2018', 'delmar': False, 'values': vals[np.newaxis, :]}
+	render_chunk(fig1, ax1, map_layers, grid, state, chunk)
+
+	recolor_chunk = dict(chunk, values=chunk['values'][:, ::-1].copy())
+
+	return {'fig': fig1, 'ax': ax1, 'map_layers': map_layers, 'grid': grid, 'state': state,
+			'chunk': chunk, 'recolor_chunk': recolor_chunk}
+
+
+# benchmark cases as (group, name, setup), setup makes the fixtures of the case (not timed)
+# and returns the function to time, so only the selected cases read or make anything
+def benchmark_cases():
+
+	cases = []
+
+	## cold start of the command line (from the directory holding the package) against the
+	## interpreter alone and the drawing modules with matplotlib
+	repo_dir = os.path.dirname(package_dir)
+	package = os.path.basename(package_dir)
+
+	cases.append(('startup', 'python', lambda: startup_case(['-c', 'pass'], repo_dir)))
+	cases.append(('startup', 'python -m ' + package + ' --help',
+			lambda: startup_case(['-m', package, '--help'], repo_dir)))
+	# png output, so the check does not depend on ffmpeg being installed
+	cases.append(('startup', 'python -m ' + package + ' render --check',
+			lambda: startup_case(['-m', package, 'render', '--check', '--set', 'output=png'], repo_dir)))
+	cases.append(('startup', 'import render (matplotlib)', lambda: startup_case(['-c', 'import render'], package_dir)))
+
+	## grid generation
+	for n_lat in [25, 201, 1000]:
+		cases.append(('grid', 'box_grid ' + str(n_lat), lambda n_lat=n_lat: grid_case(n_lat)))
+	cases.append(('grid', 'raster_grid 1000', lambda: grid_case(1000, raster=True)))
+
+	## box to tract assignment and inverse distance weighting of the real fixtures
+	for grid_file in grid_files:
+		for year in bench_years:
+			label = grid_file + ' ' + year
+
+			cases.append(('assign', label, lambda g=grid_file, y=year: tract_case(g, y, 'assign')))
+			cases.append(('idw', 'weights ' + label, lambda g=grid_file, y=year: tract_case(g, y, 'weights')))
+			cases.append(('idw', 'weights kd-tree ' + label, lambda g=grid_file, y=year: tract_case(g, y, 'kd-tree')))
+			cases.append(('idw', 'apply ' + label, lambda g=grid_file, y=year: tract_case(g, y, 'apply')))
+			cases.append(('areal', 'weights ' + label, lambda g=grid_file, y=year: tract_case(g, y, 'areal')))
+
+	## box values of all video years, in this process and with a process per cpu
+	years_label = 'idw ' + grid_files[-1] + ' ' + str(len(video_years)) + ' years, '
+
+	for workers in sorted(set([1, os.cpu_count()])):
+		cases.append(('years', years_label + str(workers) + ' workers', lambda w=workers: years_case(w)))
+
+	# every demographic variable through the same weights in one product
+	cases.append(('years', years_label + str(len(bench_variables)) + ' variables',
+			lambda: years_case(1, name_dem=bench_variables)))
+
+	## synthetic fixture
+	label = 'synthetic (' + str(synthetic_boxes) + ' boxes, ' + str(synthetic_tracts) + ' tracts)'
+
+	cases.append(('assign', label, lambda: synthetic_case('assign')))
+	cases.append(('idw', 'weights kd-tree ' + label, lambda: synthetic_case('kd-tree')))
+
+	## temporal interpolation of a decade between two years
+	frames_label = str(bench_frames) + ' frames x ' + str(synthetic_boxes) + ' boxes'
+
+	for method in ['pchip', 'linear']:
+		cases.append(('timeline', method + ' ' + frames_label, lambda method=method: timeline_case(method)))
+
+	# boxes without a value in some years (outside every tract, tracts without population)
+	cases.append(('timeline', 'pchip ' + frames_label + ', 1% missing', lambda: timeline_case('pchip', missing=True)))
+
+	## single frame render and encode on the real grids
+	for grid_file in grid_files + ['raster1000']:
+		cases.append(('render', 'full redraw ' + grid_file, lambda g=grid_file: render_case(g, 'full redraw')))
+		cases.append(('render', 'recolor ' + grid_file, lambda g=grid_file: render_case(g, 'recolor')))
+
+		# saved frames draw only the boxes and composite them with the cached static overlay
+		cases.append(('render', 'recolor composite ' + grid_file, lambda g=grid_file: render_case(g, 'composite')))
+
+	cases.append(('encode', 'png frame boundaries201.csv', lambda: encode_case('png')))
+	cases.append(('encode', 'rgba frame boundaries201.csv', lambda: encode_case('rgba')))
+
+	if shutil.which('ffmpeg') is not None:
+		cases.append(('encode', 'mp4 ' + str(bench_frames) + ' frames', lambda: encode_case('mp4')))
+
+	return cases
+
+
+# timed function of a cold start of python with args from cwd
+def startup_case(args, cwd):
+
+	return lambda: cold_start(args, cwd)
+
+
+# timed function of a box grid (or raster grid) with n_lat points in latitude
+def grid_case(n_lat, raster=False):
+
+	boundary = city_boundary()
+
+	if raster:
+		return lambda: raster_grid(boundary, n_lat)
+
+	return lambda: box_grid(boundary, n_lat)
+
+
+# timed function of a step between the boxes of grid_file and the tracts of year: 'assign',
+# 'weights' (brute force idw), 'kd-tree' (idw with the tract index), 'apply' (the idw
+# weights times the tract values) or 'areal' (the area weights)
+def tract_case(grid_file, year, kind):
+
+	boxes_data, box_xy = grid_fixture(grid_file)
+	data, tract_geoms, tract_xy = tract_fixture(year)
+
+	if kind == 'assign':
+		return lambda: assign_points_to_tracts(tract_geoms, box_xy)
+
+	if kind == 'weights':
+		return lambda: idw_weight_matrix(box_xy, tract_xy)
+
+	if kind == 'kd-tree':
+		return lambda: idw_weight_matrix(box_xy, tract_xy, index=build_centroid_index(tract_xy))
+
+	if kind == 'apply':
+		weights = idw_weight_matrix(box_xy, tract_xy)
+		return lambda: apply_weights(weights, data['dem_color'].values)
+
+	box_geoms = np.asarray(boxes_data['geometry'].values)
+
+	return lambda: areal_weight_matrix(box_geoms, tract_geoms)
+
+
+# timed function of the box values of all video years on the finest committed grid
+def years_case(workers, name_dem='white'):
+
+	box_xy = grid_fixture(grid_files[-1])[1]
+
+	return lambda: preprocess_years(video_years, grid_files[-1], box_xy, workers=workers, name_dem=name_dem)
+
+
+# timed function of a step of the synthetic fixture: 'assign' or 'kd-tree'
+def synthetic_case(kind):
+
+	box_xy, tract_geoms, tract_xy = synthetic_fixture()
+
+	if kind == 'assign':
+		return lambda: assign_points_to_tracts(tract_geoms, box_xy)
+
+	return lambda: idw_weight_matrix(box_xy, tract_xy, index=build_centroid_index(tract_xy))
+
+
+# timed function of an encode of the boundaries201 frame: 'png', 'rgba' or 'mp4'
+def encode_case(kind):
+
+	fig1 = render_fixture('boundaries201.csv')['fig']
+
+	if kind == 'mp4':
+		return lambda: encode_video(fig1, bench_frames)
+
+	return lambda: fig1.savefig(io.BytesIO(), format=kind, dpi=video_dpi)
+
+
+# timed function of a timeline case, missing=True leaves some boxes without a value
+def timeline_case(method, missing=False):
+
+	times, matrix, ts = timeline_fixture()
+
+	if missing:
+		matrix = matrix.copy()
+		matrix[1, :synthetic_boxes//100] = np.nan
+		matrix[:, -10:] = np.nan
+		return lambda: timeline_values(build_timeline(times, matrix, method=method), ts)
+
+	timeline = build_timeline(times, matrix, method=method)
+
+	return lambda: timeline_values(timeline, ts)
+
+
+# timed function of a render case on grid_file: 'full redraw', 'recolor' or 'composite'
+def render_case(grid_file, kind):
+
+	r = render_fixture(grid_file)
+
+	if kind == 'full redraw':
+		return lambda: render_frame(r['fig'], r['ax'], r['map_layers'], r['grid'], {}, r['chunk'])
+
+	if kind == 'recolor':
+		return lambda: render_frame(r['fig'], r['ax'], r['map_layers'], r['grid'], r['state'], r['recolor_chunk'])
+
+	return lambda: render_chunk(r['fig'], r['ax'], r['map_layers'], r['grid'], r['state'], r['recolor_chunk'],
+			output=io.BytesIO())
+
+
+# draw a single frame chunk on the figure including the canvas, without saving it
+def render_frame(fig1, ax1, map_layers, grid, state, chunk):
+
+	render_chunk(fig1, ax1, map_layers, grid, state, chunk)
+	fig1.canvas.draw()
+
+
+# stream frames of the figure to ffmpeg, the encode cost of a video without the drawing
+def encode_video(fig1, num_frames):
+
+	pixels = io.BytesIO()
+	fig1.savefig(pixels, format='rgba', dpi=video_dpi)
+
+	with tempfile.TemporaryDirectory() as tmp_dir:
+		video = open_video(os.path.join(tmp_dir, 'benchmark.mp4'))
+		for ind in range(num_frames):
+			video.stdin.write(pixels.getvalue())
+		close_video(video)
+
+
+# short git commit of the working tree, '' outside of a git checkout
+def git_commit():
+
+	try:
+		return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+				cwd=package_dir).stdout.strip()
+	except OSError:
+		return ''
+
+
+# median time of every case in the latest saved run that timed it, by (group, name)
+# runs with --only leave the other cases at their earlier times
+def previous_medians():
+
+	medians = {}
+	if not os.path.exists(results_file):
+		return medians
+
+	with open(results_file) as f:
+		for line in f:
+			if line.strip():
+				for result in json.loads(line)['results']:
+					medians[(result['group'], result['name'])] = result['median']
+
+	return medians
+
+
+############################
+## Main
+############################
+
+if __name__ == '__main__':
+
+	parser = argparse.ArgumentParser(description='Benchmarks of the grid, interpolation and rendering steps')
+	parser.add_argument('--quick', action='store_true', help='time every case 3 times instead of 10')
+	parser.add_argument('--only', default=None, help='only run the groups or cases containing this text')
+	parser.add_argument('--no-save', action='store_true', help='do not add the run to ' + os.path.basename(results_file))
+	args = parser.parse_args()
+
+	repeat = 10
+	if args.quick:
+		repeat = 3
+
+	previous = previous_medians()
+	run = {'commit': git_commit(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+			'python': platform.python_version(), 'numpy': np.__version__, 'shapely': shapely.__version__,
+			'matplotlib': matplotlib.__version__, 'machine': platform.machine(), 'cpus': os.cpu_count(),
+			'repeat': repeat, 'results': []}
+
+	print('%-10s %-72s %10s %10s %8s' % ('group', 'case', 'min ms', 'median ms', 'change'))
+
+	for group, name, setup in benchmark_cases():
+		if args.only is not None and args.only not in group and args.only not in name:
+			continue
+
+		times = time_func(setup(), repeat)
+		result = {'group': group, 'name': name, 'min': min(times), 'median': float(np.median(times))}
+		run['results'].append(result)
+
+		# change of the median against the previous run
+		change = ''
+		before = previous.get((group, name))
+		if before is not None:
+			change = '%+.0f%%' % (100.0*(result['median'] - before) / before)
+
+		print('%-10s %-72s %10.2f %10.2f %8s' % (group, name, 1000*result['min'], 1000*result['median'], change))
+
+	if not args.no_save:
+		os.makedirs(os.path.dirname(results_file), exist_ok=True)
+		with open(results_file, 'a') as f:
+			f.write(json.dumps(run) + '\n')
+
+		print('saved to ' + results_file)
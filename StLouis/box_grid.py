@@ -0,0 +1,176 @@
+# St. Louis Neighborhoods and tracts
+# grid of small boxes cut to the city boundary
+# every cell is made and cut with shapely array functions instead of one polygon at a time
+# or a raster grid of pixels (city mask and affine transform) for grids too fine for polygons
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+import shapely
+import os
+from data_loader import data_dir, read_geo_csv
+from interpolation import centroid_xy
+
+
+############################
+## Functions
+############################
+
+# longitude and latitude edges of the grid over the bounds of boundary
+# n_lat points in latitude and the number of longitude points keeping the spacing equal
+# to the latitude spacing, so there are (n_lon-1) x (n_lat-1) cells
+def grid_edges(boundary, n_lat):
+
+	lon1, lat1, lon2, lat2 = boundary.bounds
+
+	lat_diff = np.abs(lat1-lat2)
+	lon_diff = np.abs(lon1-lon2)
+
+	n_lon = int(n_lat * lon_diff / lat_diff)
+
+	lats = np.linspace(lat1, lat2, num=n_lat, endpoint=True)
+	lons = np.linspace(lon1, lon2, num=n_lon, endpoint=True)
+
+	return lons, lats
+
+
+# all cells of the grid as an array of box polygons in the order of the original loop
+# (longitude outer, latitude inner)
+def grid_cells(lons, lats):
+
+	lon_lo, lat_lo = np.meshgrid(lons[:-1], lats[:-1], indexing='ij')
+	lon_hi, lat_hi = np.meshgrid(lons[1:], lats[1:], indexing='ij')
+
+	return shapely.box(lon_lo.ravel(), lat_lo.ravel(), lon_hi.ravel(), lat_hi.ravel())
+
+
+# only the polygon parts of cut cells, a cell touching the boundary at a corner or along
+# an edge leaves a point or line which is dropped (None)
+# cells cut into several pieces by the boundary become one multipolygon
+def polygon_parts(geoms):
+
+	parts, geom_ind = shapely.get_parts(geoms, return_index=True)
+
+	keep = (shapely.get_type_id(parts) == 3) & (shapely.area(parts) > 0)
+	parts = parts[keep]
+	geom_ind = geom_ind[keep]
+
+	result = np.full(len(geoms), None, dtype=object)
+	num_parts = np.bincount(geom_ind, minlength=len(geoms))
+
+	single = num_parts[geom_ind] == 1
+	result[geom_ind[single]] = parts[single]
+
+	if not single.all():
+		multi_ind, multi_pos = np.unique(geom_ind[~single], return_inverse=True)
+		result[multi_ind] = shapely.multipolygons(parts[~single], indices=multi_pos)
+
+	return result
+
+
+# cells of the grid cut to the boundary, cells outside the boundary are dropped
+# the prepared boundary sorts out the cells fully inside (kept as they are) and fully
+# outside, only the cells crossing the boundary line are intersected
+def box_grid(boundary, n_lat):
+
+	lons, lats = grid_edges(boundary, n_lat)
+	cells = grid_cells(lons, lats)
+
+	shapely.prepare(boundary)
+	inside = shapely.contains_properly(boundary, cells)
+	crossing = ~inside & shapely.intersects(boundary, cells)
+
+	boxes = np.full(len(cells), None, dtype=object)
+	boxes[inside] = cells[inside]
+	boxes[crossing] = polygon_parts(shapely.intersection(cells[crossing], boundary))
+
+	return boxes[~shapely.is_missing(boxes)]
+
+
+# save the boxes as name.csv in the data directory with a WKT geometry column, indexed by
+# 'boundaries', the file the scripts and render configs name (data_loader.read_geo_csv keeps
+# a GeoParquet copy of it in the cache, so the WKT is only parsed once)
+def write_box_grid(boxes, name):
+
+	import geopandas as gpd
+
+	grid = gpd.GeoDataFrame({'geometry': boxes}, geometry='geometry')
+	grid.index.name = 'boundaries'
+
+	path = os.path.join(data_dir, name + '.csv')
+	grid.to_csv(path)
+
+	return path
+
+
+# raster grid over the bounds of boundary with the cells of grid_edges as pixels
+# returns a dict with
+#   mask: (rows, columns) boolean array, True for the pixels with their center in the city
+#   transform: affine (a, b, c, d, e, f) from the pixel corner (column, row) to longitude and
+#       latitude, lon = a*column + b*row + c and lat = d*column + e*row + f
+#   extent: (left, right, bottom, top) of the image for imshow
+# row 0 is the northern edge like an image, so the pixels can be drawn as they are
+def raster_grid(boundary, n_lat):
+
+	lons, lats = grid_edges(boundary, n_lat)
+
+	lon_dist = lons[1] - lons[0]
+	lat_dist = lats[1] - lats[0]
+
+	# pixel centers, latitude decreasing down the rows
+	lon_c = (lons[:-1] + lons[1:]) / 2.0
+	lat_c = ((lats[:-1] + lats[1:]) / 2.0)[::-1]
+	lon_grid, lat_grid = np.meshgrid(lon_c, lat_c)
+
+	shapely.prepare(boundary)
+	mask = shapely.contains_xy(boundary, lon_grid, lat_grid)
+
+	return {'mask': mask,
+			'transform': (lon_dist, 0.0, lons[0], 0.0, -lat_dist, lats[-1]),
+			'extent': (lons[0], lons[-1], lats[0], lats[-1])}
+
+
+# longitude and latitude of the city pixel centers as an (n, 2) array, in the row major
+# order of grid['mask'] (the order of the pixel values everywhere else)
+def raster_xy(grid):
+
+	a, b, c, d, e, f = grid['transform']
+	rows, cols = np.nonzero(grid['mask'])
+
+	return np.column_stack([a*(cols + 0.5) + b*(rows + 0.5) + c, d*(cols + 0.5) + e*(rows + 0.5) + f])
+
+
+# grid of the mapping scripts by name, 'raster<n>' is a raster grid with n points in latitude
+# over the city boundary and anything else is a box grid file (e.g. 'boundaries201.csv')
+def load_grid(boxes_file):
+
+	if boxes_file.startswith('raster'):
+		stl_data = read_geo_csv('stl_boundary.csv', 'Name')
+		return raster_grid(stl_data.loc['STL_boundary'].geometry, int(boxes_file[len('raster'):]))
+
+	return read_geo_csv(boxes_file, 'boundaries')
+
+
+# point of every box (centroid) or city pixel (center) to interpolate the tract values at
+def grid_xy(grid):
+
+	if isinstance(grid, dict):
+		return raster_xy(grid)
+
+	return centroid_xy(grid)
+
+
+# polygon of every box, or the square of every city pixel, in the order of grid_xy
+def grid_geoms(grid):
+
+	if isinstance(grid, dict):
+		a, b, c, d, e, f = grid['transform']
+		rows, cols = np.nonzero(grid['mask'])
+
+		# corners of the pixels, e is negative so the latitude of row + 1 is the southern edge
+		return shapely.box(a*cols + c, e*(rows + 1) + f, a*(cols + 1) + c, e*rows + f)
+
+	return np.asarray(grid['geometry'].values)
@@ -30,9 +30,13 @@ import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
-from shapely import wkt
 import csv
 import numpy as np
+from data_loader import read_geo_csv, load_year
+from render import parse_render_args
+from normalize import normalize_values
+from run_report import start_report, stage, frame_done, write_report
+import time
 
 
 ############################
@@ -44,18 +48,16 @@ import numpy as np
 ## Main
 ############################
 
-# read in parks data file
-parks_data_file = 'parks_data.csv'
+# command line options, the maps are only shown with --preview
+args = parse_render_args('Maps of the St. Louis tract correlation between people of color and income for every census year')
 
-parks_data_csv = pd.read_csv(parks_data_file)
-parks_data = gpd.GeoDataFrame(parks_data_csv)
+# time the stages of the run for the run report
+start_report(profile=args.profile)
 
-# set the names as the index
-parks_data.set_index("name", inplace=True)
+# read in parks data file
+parks_data_file = 'parks_data.csv'
 
-# set the geometry column to the geometry
-parks_data['geometry'] = parks_data['geometry'].apply(wkt.loads)
-parks_data.set_geometry('geometry')
+parks_data = read_geo_csv(parks_data_file, 'name')
 
 # change the extra data colors
 parks_data['color'] = 'green'
@@ -76,25 +78,15 @@ cor_bar.ax.set_yticklabels(['Low Correlation','High Correlation'])
 #plt.gcf().text(0.21,0.8, '% People of Color', fontsize=12)
 
 
+# income colors between the lowest and highest income ('minmax'), the 4th lowest and highest
+# with the outliers clipped ('clip') or the lowest and highest log income ('log')
+inc_mode = 'minmax'
+
+vid_count = 0
 years = ['1940','1950','1960','1970','1980','2010','2011','2012','2013','2014','2015','2016','2017','2018']
 for year in years:
 
-	# read in the data file
-	data_file = year + '_data.csv'
-
-	# data 2010 to 2018 are ACS (American Community Survey) estimates 
-	if int(year) > 2009:
-		data_file = year + '_data_ACS_estimates.csv'
-
-	data_csv = pd.read_csv(data_file)
-	data = gpd.GeoDataFrame(data_csv)
-
-	# set the tracts as the index
-	data.set_index("tract", inplace=True)
-
-	# set the geometry column to the geometry
-	data['geometry'] = data['geometry'].apply(wkt.loads)
-	data = data.set_geometry('geometry')
+	frame_start = time.perf_counter()
 
 	# demographic variables
 	dem_color = 'dem_color'
@@ -108,26 +100,17 @@ for year in years:
 	# correlation variables
 	cor_color = 'cor_color'
 
-	# initialize demogaphric colors by normalizing by population
-	data[dem_color] = data[name_poc].values / data[name_pop].values
-
-	# determine income colors and finding missing data
-	max_inc = data[name_inc].max()
-	min_inc = data[name_inc].min()
-
-	# normalize income data
-	data[inc_color] = (data[name_inc].values - min_inc) / (max_inc - min_inc)
+	# read in the data file with the demographic colors (2010 to 2018 are ACS estimates)
+	with stage('load'):
+		data = load_year(year, name_poc, name_pop)
 
-	# check for missing data or zeros
-	inc_names = []
+	# determine income colors and finding missing data (NaN), income colors are 0 to 1
+	with stage('normalize'):
+		inc_colors, no_inc = normalize_values(data[name_inc].values, mode=inc_mode)
+		data[inc_color] = inc_colors
 
-	for name in data.index:
-		color_val = data.loc[name][inc_color].item()
-		if color_val!=color_val: # nan does not equal itself
-			print(year, name, color_val)
-			color_val = 0
-			inc_names.append(name)
-		data.at[name, inc_color] = color_val
+	for name in data.index[no_inc]:
+		print(year, name, np.nan)
 
 	# demographic color and income color is normalized between 0 and 1
 	# dem_color: 1 is 100% of people of color
@@ -135,19 +118,16 @@ for year in years:
 
 	data[cor_color] = np.abs(data[dem_color]-data[inc_color])
 
-	# make list of names with no data into numpy arrays for easier use
-	inc_names = np.array(inc_names)
-
 	# copy shape dataframe of neighborhoods with no data
-	if len(inc_names) != 0:
-		inc_no_data = gpd.GeoDataFrame(data, index=inc_names)
+	if no_inc.any():
+		inc_no_data = data[no_inc]
 
 
 	## plot correlation data
 	data.plot(column=cor_color,cmap='Greys', edgecolor='black', ax=ax1, legend=False)
 
 	# add no data red plot
-	if len(inc_names) != 0:
+	if no_inc.any():
 		inc_no_data.plot(color='r', edgecolor='black', ax=ax1)
 
 	
@@ -175,10 +155,23 @@ for year in years:
 	fig1.suptitle(year, x=0.5, y=0.9, fontsize=18)
 	
 	# pause for viewing
-	plt.show(block=False)
-	plt.pause(1)
+	if args.preview:
+		plt.show(block=False)
+		plt.pause(1)
+
+	# save the images by increasing the name by one for each frame
+	if args.save:
+		vid_count = vid_count + 1
+		vid_num = str(vid_count).zfill(5)
+		with stage('encode'):
+			savename = 'video/correlation_' + vid_num + '.png'
+			plt.savefig(savename, dpi=100)
+
+	frame_done(time.perf_counter() - frame_start)
 
 #plt.show()
-plt.pause(3)
+if args.preview:
+	plt.pause(3)
 plt.close()
 
+write_report(__file__, args.report)
@@ -0,0 +1,136 @@
+# St. Louis Neighborhoods and tracts
+# read the csv files with a WKT geometry column (census years, box grids, parks, boundary)
+# the parsed files are cached as GeoParquet so the WKT is only parsed once per csv change
+# census years are also kept in memory so the year loops never read the same year twice
+# pandas and geopandas are imported by the functions reading the files, so the file names
+# and settings can be used (e.g. to check a render config) without loading them
+
+
+############################
+## Imports
+############################
+
+import importlib.util
+import functools
+import os
+from run_report import stage
+
+# GeoParquet needs pyarrow, without it the csv files are parsed on every run
+# (only looked up here, it is imported by geopandas when a parquet file is read)
+use_parquet = importlib.util.find_spec('pyarrow') is not None
+
+
+############################
+## Constants
+############################
+
+# data files live next to the scripts
+data_dir = os.path.dirname(os.path.abspath(__file__))
+cache_dir = os.path.join(data_dir, 'cache')
+
+# number of census years kept in memory (each year is a few MB with the tract shapes)
+years_in_memory = 4
+
+
+############################
+## Functions
+############################
+
+# name of the cached copy of a csv file: <csv name>.<modified time>_<size>.parquet
+# editing or replacing the csv changes the name, so an outdated copy is never read
+def geo_cache_path(path):
+
+	st = os.stat(path)
+	stem = os.path.splitext(os.path.basename(path))[0]
+	key = format(st.st_mtime_ns, 'x') + '_' + format(st.st_size, 'x')
+
+	return os.path.join(cache_dir, stem + '.' + key + '.parquet')
+
+
+# parse a csv file with a WKT geometry column and set index_col as the index
+def parse_geo_csv(path, index_col):
+
+	import pandas as pd
+	import geopandas as gpd
+	from shapely import wkt
+
+	with stage('parse'):
+		data_csv = pd.read_csv(path)
+		data = gpd.GeoDataFrame(data_csv)
+
+		data.set_index(index_col, inplace=True)
+
+		# set the geometry column to the geometry
+		data['geometry'] = data['geometry'].apply(wkt.loads)
+		data = data.set_geometry('geometry')
+
+	return data
+
+
+# GeoDataFrame of a csv file in the data directory, read from the GeoParquet cache when
+# the csv has not changed since it was last parsed
+# GeoParquet files (e.g. box grids from box_grid.py) are read as they are
+def read_geo_csv(filename, index_col):
+
+	import geopandas as gpd
+
+	path = os.path.join(data_dir, filename)
+
+	if filename.endswith('.parquet'):
+		return gpd.read_parquet(path, memory_map=True)
+
+	if not use_parquet:
+		return parse_geo_csv(path, index_col)
+
+	cached = geo_cache_path(path)
+	if os.path.exists(cached):
+		return gpd.read_parquet(cached, memory_map=True)
+
+	data = parse_geo_csv(path, index_col)
+
+	# write a copy and rename it, processes reading the same csv at the same time (e.g. the
+	# frame workers of a cold cache) never read half a file
+	os.makedirs(cache_dir, exist_ok=True)
+	part = cached[:-len('.parquet')] + '.' + str(os.getpid()) + '.part'
+	data.to_parquet(part)
+	os.replace(part, cached)
+
+	# remove the copies of older versions of the same csv, another process may have
+	# removed them already
+	stem = os.path.basename(cached).split('.')[0]
+	for name in os.listdir(cache_dir):
+		if name.endswith('.parquet') and name.split('.')[0] == stem and name != os.path.basename(cached):
+			try:
+				os.remove(os.path.join(cache_dir, name))
+			except FileNotFoundError:
+				pass
+
+	return data
+
+
+# census data file for a year, 2010 to 2018 are ACS (American Community Survey) estimates
+def year_file(year):
+
+	if int(year) > 2009:
+		return str(year) + '_data_ACS_estimates.csv'
+
+	return str(year) + '_data.csv'
+
+
+@functools.lru_cache(maxsize=years_in_memory)
+def load_year_cached(year, name_dem, name_pop):
+
+	data = read_geo_csv(year_file(year), 'tract')
+
+	# initialize demographic colors by normalizing by population
+	data['dem_color'] = data[name_dem].values / data[name_pop].values
+
+	return data
+
+
+# tract data of a census year with the demographic color (name_dem / name_pop) in 'dem_color'
+# the same GeoDataFrame is returned for repeated calls, so it should not be changed in place
+# except to add columns derived from the year itself
+def load_year(year, name_dem='white', name_pop='population'):
+
+	return load_year_cached(str(int(year)), name_dem, name_pop)
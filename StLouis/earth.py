@@ -1,33 +1,55 @@
-import fiona 
-import geopandas as gpd
-import shapely
-import matplotlib.pyplot as plt
+# St. Louis Neighborhoods and tracts
+# read a kml file drawn in Google Earth (tracts, wards, parks), show it and save it as csv
+# fiona and geopandas are only imported to read the file, so importing this is free
 
-# Enable fiona driver
-gpd.io.file.fiona.drvsupport.supported_drivers['KML'] = 'rw'
 
-#path = "1980_edits.kml"
-#path = "1970_tracts.kml"
-#path = "1950_edits.kml"
-#path = "parks.kml"
-#path = "1940_edits.kml"
-#path = "2010_edits.kml"
-#path = "2000_edits.kml"
-#path = "1930_tracts.kml"
-path = "1900_wards.kml"
+############################
+## Functions
+############################
 
-# Read file
-df = gpd.read_file(path, driver='KML')
-    
-# Drop Z dimension of polygons that occurs often in kml 
-df.geometry = df.geometry.map(lambda polygon: shapely.ops.transform(lambda x, y, z: (x, y), polygon))
+# GeoDataFrame of a kml file with the Z dimension of the polygons dropped (it occurs often in kml)
+def read_kml(path):
 
+	import fiona
+	import geopandas as gpd
+	from shapely.ops import transform
 
-print(df.head(5))
+	# Enable fiona driver
+	fiona.drvsupport.supported_drivers['KML'] = 'rw'
 
-df.plot()
-plt.show()
+	# Read file
+	df = gpd.read_file(path, driver='KML')
 
+	# Drop Z dimension of polygons that occurs often in kml
+	df.geometry = df.geometry.map(lambda polygon: transform(lambda x, y, z: (x, y), polygon))
 
-# save dataframe as csv
-df.to_csv('temp.csv')
\ No newline at end of file
+	return df
+
+
+############################
+## Main
+############################
+
+if __name__ == '__main__':
+
+	import matplotlib.pyplot as plt
+
+	#path = "1980_edits.kml"
+	#path = "1970_tracts.kml"
+	#path = "1950_edits.kml"
+	#path = "parks.kml"
+	#path = "1940_edits.kml"
+	#path = "2010_edits.kml"
+	#path = "2000_edits.kml"
+	#path = "1930_tracts.kml"
+	path = "1900_wards.kml"
+
+	df = read_kml(path)
+
+	print(df.head(5))
+
+	df.plot()
+	plt.show()
+
+	# save dataframe as csv
+	df.to_csv('temp.csv')
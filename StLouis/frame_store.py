@@ -0,0 +1,225 @@
+# St. Louis Neighborhoods and tracts
+# box values of every video frame kept on disk as a memory mapped .npy (frames x boxes)
+# with a small json manifest of the chunks and how far the render got
+# an interrupted render resumes after the last finished frame and any number of render
+# processes read the values from the same file without copying them
+# a finished render is found from its settings and data files before any year is prepared
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+import hashlib
+import json
+import os
+
+
+############################
+## Constants
+############################
+
+# one directory per video next to the other cached data
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'frames')
+
+# png frames of every render go to the same video/NNNNN.png files (relative to the run like
+# in render.render_chunk), this file says which render wrote them
+png_signature_file = os.path.join('video', 'frames.json')
+
+
+############################
+## Functions
+############################
+
+# hash of the box values of every year and the timeline settings, any change to either
+# gives new frame values
+def frame_store_key(years, year_colors, settings):
+
+	h = hashlib.sha1()
+	h.update(json.dumps([list(years), settings]).encode())
+
+	for year in years:
+		h.update(np.ascontiguousarray(year_colors[year], dtype=float).tobytes())
+
+	return h.hexdigest()[:16]
+
+
+# hash of the settings the frame values come from and the size and modified time of the
+# data files they are read from, known before anything is loaded
+# changes to the code calculating the values are not seen, restart renders them again
+def frame_source_key(settings, files):
+
+	stats = [[os.path.basename(path), os.stat(path).st_mtime_ns, os.stat(path).st_size] for path in files]
+
+	return hashlib.sha1(json.dumps([settings, stats]).encode()).hexdigest()[:16]
+
+
+# manifest of a store directory, None if there is none (never finished writing the values)
+def read_manifest(path):
+
+	manifest_file = os.path.join(path, 'manifest.json')
+	if not os.path.exists(manifest_file):
+		return None
+
+	with open(manifest_file) as f:
+		return json.load(f)
+
+
+# replace the manifest in one step, so a crash never leaves half a manifest
+def write_manifest(path, manifest):
+
+	manifest_file = os.path.join(path, 'manifest.json')
+
+	with open(manifest_file + '.tmp', 'w') as f:
+		json.dump(manifest, f)
+
+	os.replace(manifest_file + '.tmp', manifest_file)
+
+
+# write the values of all chunks (timeline.build_frame_chunks) to path/values.npy
+# the manifest is written last, so a store without one is never used
+def write_frame_store(path, key, chunks, frames, boxes):
+
+	os.makedirs(path, exist_ok=True)
+
+	if os.path.exists(os.path.join(path, 'manifest.json')):
+		os.remove(os.path.join(path, 'manifest.json'))
+
+	values = np.lib.format.open_memmap(os.path.join(path, 'values.npy'), mode='w+',
+			dtype=np.float32, shape=(frames, boxes))
+
+	layout = []
+	for chunk in chunks:
+		row = chunk['frame'] - 1
+		values[row:row+len(chunk['values'])] = chunk['values']
+		layout.append([chunk['frame'], chunk['year'], chunk['delmar'], len(chunk['values'])])
+
+	values.flush()
+	del values
+
+	manifest = {'key': key, 'frames': frames, 'boxes': boxes, 'chunks': layout, 'render': None}
+	write_manifest(path, manifest)
+
+	return manifest
+
+
+# frame store of the video called name, a dict with the directory, manifest and the values
+# opened read only as a memory map
+# the values are only calculated from chunks (a generator, nothing is done until it is
+# read) when there is no store with the same key
+# source (frame_source_key) is kept in the manifest for render_finished
+def open_frame_store(name, key, chunks, frames, boxes, source=None):
+
+	path = os.path.join(cache_dir, name)
+	manifest = read_manifest(path)
+
+	if manifest is None or manifest['key'] != key:
+		manifest = write_frame_store(path, key, chunks, frames, boxes)
+
+	if manifest.get('source') != source:
+		manifest['source'] = source
+		write_manifest(path, manifest)
+
+	values_file = os.path.join(path, 'values.npy')
+
+	return {'path': path, 'values_file': values_file, 'manifest': manifest,
+			'values': np.load(values_file, mmap_mode='r')}
+
+
+# signature of the png frames of a render, the store and the drawing settings
+def png_signature(name, key, settings):
+
+	return {'name': name, 'key': key, 'settings': settings}
+
+
+# signature of the render that last wrote png frames, None if there is none
+def read_png_signature():
+
+	if not os.path.exists(png_signature_file):
+		return None
+
+	with open(png_signature_file) as f:
+		return json.load(f)
+
+
+# True when the video called name was rendered to the end to output_format / video_file from
+# the same source (frame_source_key) and drawing settings (label, fps, ...) and the output is
+# still there, so there is nothing to prepare or draw
+# png frames also have to be the ones of this render (png_signature_file), every render
+# writes the same files
+# frames that are only drawn (output_format None) are never done
+def render_finished(name, source, output_format, video_file, settings=None):
+
+	manifest = read_manifest(os.path.join(cache_dir, name))
+	if output_format is None or manifest is None or manifest.get('source') != source:
+		return False
+
+	render = manifest['render']
+	if (render is None or not render['finished'] or render['output'] != output_format
+			or render['video_file'] != video_file or render.get('settings') != settings):
+		return False
+
+	if output_format == 'png':
+		return (read_png_signature() == png_signature(name, manifest['key'], settings)
+				and os.path.exists(os.path.join('video', str(manifest['frames']).zfill(5) + '.png')))
+
+	return os.path.exists(video_file)
+
+
+# chunks still to render to output_format / video_file, views into the memory map
+# a finished render, a different output or settings or restart start again from the first
+# frame, so do png frames last written by another render
+def resume_chunks(store, output_format, video_file, restart=False, settings=None):
+
+	render = store['manifest']['render']
+	name = os.path.basename(store['path'])
+	signature = png_signature(name, store['manifest']['key'], settings)
+
+	if (restart or render is None or render['finished'] or render['output'] != output_format
+			or render['video_file'] != video_file or render.get('settings') != settings
+			or (output_format == 'png' and read_png_signature() != signature)):
+		render = {'output': output_format, 'video_file': video_file, 'settings': settings,
+				'rendered': 0, 'parts': [], 'finished': False}
+		store['manifest']['render'] = render
+		write_manifest(store['path'], store['manifest'])
+
+	# the png frames from here on are this render's
+	if output_format == 'png':
+		os.makedirs(os.path.dirname(png_signature_file), exist_ok=True)
+		with open(png_signature_file, 'w') as f:
+			json.dump(signature, f)
+
+	elif render['rendered'] != 0:
+		print('resuming after frame ' + str(render['rendered']) + ' of ' + str(store['manifest']['frames']))
+
+	return store_chunks(store, render['rendered'] + 1)
+
+
+# chunks of the store from first_frame on, 'frames' is the number of frames in the chunk
+def store_chunks(store, first_frame=1):
+
+	for frame, year, delmar, num_frames in store['manifest']['chunks']:
+		if frame < first_frame:
+			continue
+
+		yield {'frame': frame, 'year': year, 'delmar': delmar, 'frames': num_frames,
+				'values': store['values'][frame-1:frame-1+num_frames]}
+
+
+# record that every frame up to frame has been saved, with the mp4 segment holding them
+def mark_rendered(store, frame, part=None):
+
+	render = store['manifest']['render']
+	render['rendered'] = frame
+	if part is not None:
+		render['parts'].append(part)
+
+	write_manifest(store['path'], store['manifest'])
+
+
+# record that the render is complete, the next run starts again
+def finish_render(store):
+
+	store['manifest']['render']['finished'] = True
+	write_manifest(store['path'], store['manifest'])
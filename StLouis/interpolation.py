@@ -0,0 +1,189 @@
+# St. Louis Neighborhoods and tracts
+# interpolate tract values onto the small boxes
+# inverse distance weighting of the nearest tract centroids for every box at once
+# and the values of the boxes at the times between the census years
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+import shapely
+import math
+from scipy.sparse import csr_matrix
+from spatial_index import R_earth, nearest_tracts
+
+
+############################
+## Constants
+############################
+
+# number of boxes handled per batch, memory is chunk_size x number of tracts
+chunk_size = 2048
+
+
+############################
+## Functions
+############################
+
+# longitude and latitude of the geometry centroids as an (n, 2) array
+def centroid_xy(gdf):
+
+	ct = shapely.centroid(np.asarray(gdf['geometry'].values))
+
+	return np.column_stack([shapely.get_x(ct), shapely.get_y(ct)])
+
+
+# great circle distance between points in degrees, arrays broadcast against each other
+# divided by 10 like the original per box loop so the weights match bit for bit
+def haversine_scaled(lon_1, lat_1, lon_2, lat_2):
+
+	phi_1 = (math.pi/180.0) * lat_1
+	lambda_1 = (math.pi/180.0) * lon_1
+
+	phi_2 = (math.pi/180.0) * lat_2
+	lambda_2 = (math.pi/180.0) * lon_2
+
+	delta_phi = phi_2 - phi_1
+	delta_lambda = lambda_2 - lambda_1
+
+	a_part = np.power(np.sin(delta_phi / 2.0), 2) + np.multiply(np.multiply(np.cos(phi_1),
+			np.cos(phi_2)), np.power(np.sin(delta_lambda/2.0), 2))
+
+	dist = np.absolute((2.0*R_earth) * np.arctan2(np.sqrt(a_part), np.sqrt(1.0 - a_part))) / 10.0
+
+	return dist
+
+
+# scaled great circle distance from every box to every tract, shape (boxes, tracts)
+def haversine_matrix(box_xy, tract_xy):
+
+	return haversine_scaled(box_xy[:, 0][:, np.newaxis], box_xy[:, 1][:, np.newaxis],
+			tract_xy[:, 0][np.newaxis, :], tract_xy[:, 1][np.newaxis, :])
+
+
+# sparse (boxes x tracts) matrix of the inverse distance weights of the lowest_vals nearest tracts
+# box_xy and tract_xy are (n, 2) arrays of longitude and latitude in degrees
+# index is an optional kd-tree from spatial_index.build_centroid_index for very fine grids,
+# without it every box is compared to every tract
+# the weights are not normalized, apply_weights divides by the row sums
+def idw_weight_matrix(box_xy, tract_xy, lowest_vals=4, power=2, chunk_size=chunk_size, index=None):
+
+	box_xy = np.asarray(box_xy, dtype=float)
+	tract_xy = np.asarray(tract_xy, dtype=float)
+
+	lowest_vals = min(lowest_vals, len(tract_xy))
+	tract_cols = []
+	tract_weights = []
+
+	for start in range(0, len(box_xy), chunk_size):
+		stop = start + chunk_size
+
+		chunk_xy = box_xy[start:stop]
+
+		# indices of the nearest tracts for each box in the chunk
+		if index is not None:
+			lowest_vals_index = nearest_tracts(index, chunk_xy, lowest_vals)[1]
+			dist = haversine_scaled(chunk_xy[:, 0][:, np.newaxis], chunk_xy[:, 1][:, np.newaxis],
+					tract_xy[lowest_vals_index, 0], tract_xy[lowest_vals_index, 1])
+
+		else:
+			dist = haversine_matrix(chunk_xy, tract_xy)
+
+			if lowest_vals < len(tract_xy):
+				lowest_vals_index = np.argpartition(dist, lowest_vals, axis=1)[:, :lowest_vals]
+			else:
+				lowest_vals_index = np.broadcast_to(np.arange(len(tract_xy)), dist.shape)
+
+			dist = np.take_along_axis(dist, lowest_vals_index, axis=1)
+
+		tract_cols.append(lowest_vals_index.ravel())
+		tract_weights.append((1.0 / np.power(dist, power)).ravel())
+
+	# every box has exactly lowest_vals weights, kept in the order they were found
+	indptr = np.arange(0, len(box_xy)*lowest_vals + 1, lowest_vals)
+
+	return csr_matrix((np.concatenate(tract_weights), np.concatenate(tract_cols), indptr),
+			shape=(len(box_xy), len(tract_xy)))
+
+
+# box values from a weight matrix, the same as np.nansum(vals*weights) / np.sum(weights) per box
+# missing (NaN) tract values add nothing to the numerator but keep their weight
+# tract_vals is one value per tract or a (tracts, variables) array for several variables at once
+def apply_weights(weights, tract_vals):
+
+	tract_vals = np.asarray(tract_vals, dtype=float)
+	# multiplying by ones sums each row in stored order, matching np.sum over the nearest tracts
+	row_sum = weights @ np.ones(weights.shape[1])
+	if tract_vals.ndim == 2:
+		row_sum = row_sum[:, np.newaxis]
+
+	return (weights @ np.where(np.isnan(tract_vals), 0.0, tract_vals)) / row_sum
+
+
+# sparse (boxes x tracts) matrix with a 1 for the tract of every box (box_tract from
+# spatial_index.assign_points_to_tracts), so assigned boxes go through the same weight functions
+def assignment_matrix(box_tract, num_tracts):
+
+	box_tract = np.asarray(box_tract)
+
+	return csr_matrix((np.ones(len(box_tract)), box_tract, np.arange(len(box_tract) + 1)),
+			shape=(len(box_tract), num_tracts))
+
+
+# rates of the boxes (e.g. white / population) with the numerator and denominator counts of
+# the tracts weighted together in one product and divided once on the boxes, so a tract
+# counts by its population and not only by its weight
+# numerator is one count per tract or a (tracts, variables) array of counts over the same
+# denominator, every variable goes through the same product
+# tracts missing (NaN) a numerator or the denominator add nothing to that rate, boxes with a
+# denominator of 0 are NaN
+# returns (rates, denominator), rates has one value per box or a (boxes, variables) array
+# the denominator on the boxes is divided by the row sums of the weights with normalize=True
+# (e.g. the inverse distance weighted tract population) and is the weighted sum of the tract
+# counts otherwise (e.g. the population of the box area)
+def apply_rate_weights(weights, numerator, denominator, normalize=True):
+
+	numerator = np.asarray(numerator, dtype=float)
+	denominator = np.asarray(denominator, dtype=float)
+
+	numerators = numerator.reshape(len(numerator), -1)
+	num_vars = numerators.shape[1]
+
+	# numerators, their denominators and the denominator of every tract with one
+	known = ~np.isnan(numerators) & ~np.isnan(denominator)[:, np.newaxis]
+	counts = np.hstack([np.where(known, numerators, 0.0), np.where(known, denominator[:, np.newaxis], 0.0),
+			np.where(np.isnan(denominator), 0.0, denominator)[:, np.newaxis]])
+
+	box_counts = weights @ counts
+
+	with np.errstate(invalid='ignore', divide='ignore'):
+		rates = box_counts[:, :num_vars] / box_counts[:, num_vars:2*num_vars]
+
+	box_denominator = box_counts[:, -1]
+	if normalize:
+		box_denominator = box_denominator / (weights @ np.ones(weights.shape[1]))
+
+	return rates.reshape((weights.shape[0],) + numerator.shape[1:]), box_denominator
+
+
+# inverse distance weighted value of the lowest_vals nearest tracts for every box
+# returns an array with one value per box
+def idw_interpolate(box_xy, tract_xy, tract_vals, lowest_vals=4, power=2, chunk_size=chunk_size, index=None):
+
+	weights = idw_weight_matrix(box_xy, tract_xy, lowest_vals=lowest_vals, power=power,
+			chunk_size=chunk_size, index=index)
+
+	return apply_weights(weights, tract_vals)
+
+
+# box values at the times ts (years after the first year) on the straight line between
+# the box values of two years, returns a (len(ts), boxes) float32 array
+# every step is calculated in one broadcast instead of once per frame
+def linear_steps(vals, vals2, year_diff, ts):
+
+	vals = np.asarray(vals, dtype=float)
+	slope = (np.asarray(vals2, dtype=float) - vals) / year_diff
+
+	return (slope*np.asarray(ts, dtype=float)[:, np.newaxis] + vals).astype(np.float32)
@@ -13,10 +13,10 @@ import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
-from shapely import wkt
 import csv
 import numpy as np
 import math
+from data_loader import read_geo_csv, load_year
 
 
 ############################
@@ -53,11 +53,7 @@ def haversine(coord1, coord2):
 
 # read in the boundaries of the small boxes
 boxes_file = 'boundaries25.csv'
-boxes_csv = pd.read_csv(boxes_file)
-boxes_data = gpd.GeoDataFrame(boxes_csv)
-boxes_data.set_index("boundaries", inplace=True)
-boxes_data['geometry'] = boxes_data['geometry'].apply(wkt.loads)
-boxes_data.set_geometry('geometry')
+boxes_data = read_geo_csv(boxes_file, 'boundaries')
 boxes_data['color'] = 0.0
 boxes_data['color2'] = 0.0
 boxes_data['color3'] = 0.0  # intermediate steps
@@ -67,15 +63,7 @@ boxes_data['centroid'] = boxes_data.geometry.centroid
 # read in parks data file
 parks_data_file = 'parks_data.csv'
 
-parks_data_csv = pd.read_csv(parks_data_file)
-parks_data = gpd.GeoDataFrame(parks_data_csv)
-
-# set the names as the index
-parks_data.set_index("name", inplace=True)
-
-# set the geometry column to the geometry
-parks_data['geometry'] = parks_data['geometry'].apply(wkt.loads)
-parks_data.set_geometry('geometry')
+parks_data = read_geo_csv(parks_data_file, 'name')
 
 # change the extra data colors
 parks_data['color'] = 'green'
@@ -102,11 +90,7 @@ plt.gcf().text(0.20,0.8, '% Population White', fontsize=12)
 
 # St. Louis boundary data
 stl_file = 'stl_boundary.csv'
-stl_csv = pd.read_csv(stl_file)
-stl_data = gpd.GeoDataFrame(stl_csv)
-stl_data.set_index("Name", inplace=True)
-stl_data['geometry'] = stl_data['geometry'].apply(wkt.loads)
-stl_data.set_geometry('geometry')
+stl_data = read_geo_csv(stl_file, 'Name')
 
 
 # years to show for mapping (2018 twice b/c last and want to show Delmar divide)
@@ -134,37 +118,18 @@ for year in years:
 		ax1[0].cla()
 		ax1[1].cla()
 
-		# clear data from memory and replace with data2
-		del data
-		data = data2.copy(deep=True)
+		# the year was already loaded (and cached) as data2 for the interpolation
+		data = load_year(year, name_dem, name_pop)
 
 		# copy the box data from the next year
 		boxes_data['color'] = boxes_data['color2'].values
 
 
 	else: 
-		# read in the data file
-		data_file = year + '_data.csv'
-
-		# data 2010 to 2018 are ACS (American Community Survey) estimates 
-		if int(year) > 2009:
-			data_file = year + '_data_ACS_estimates.csv'
-
-		
-		data_csv = pd.read_csv(data_file)
-		data = gpd.GeoDataFrame(data_csv)
-
-		# set the tracts as the index
-		data.set_index("tract", inplace=True)
-
-		# set the geometry column to the geometry
-		data['geometry'] = data['geometry'].apply(wkt.loads)
-		data = data.set_geometry('geometry')
+		# read in the data file with the demographic colors (2010 to 2018 are ACS estimates)
+		data = load_year(year, name_dem, name_pop)
 		data['centroid'] = data.geometry.centroid
 
-		# initialize demographic colors by normalizing by population
-		data[dem_color] = data[name_dem].values / data[name_pop].values
-
 		
 		for bind in boxes_data.index:
 
@@ -266,25 +231,8 @@ for year in years:
 	if year!=years[-1] and interpolate==True:
 
 		year2 = years[years_count+1]
-		data_file2 = year2 + '_data.csv'
-
-		# data 2010 to 2018 are ACS (American Community Survey) estimates 
-		if int(year2) > 2009:
-			data_file2 = year2 + '_data_ACS_estimates.csv'
-
-		
-		data_csv2 = pd.read_csv(data_file2)
-		data2 = gpd.GeoDataFrame(data_csv2)
-
-		# set the tracts as the index
-		data2.set_index("tract", inplace=True)
-
-		# set the geometry column to the geometry
-		data2['geometry'] = data2['geometry'].apply(wkt.loads)
-		data2 = data2.set_geometry('geometry')
-
-		# initialize demographic colors by normalizing by population
-		data2[dem_color] = data2[name_dem].values / data2[name_pop].values
+		# read in the data file with the demographic colors (2010 to 2018 are ACS estimates)
+		data2 = load_year(year2, name_dem, name_pop)
 		data2['centroid'] = data2.geometry.centroid
 
 		
@@ -27,9 +27,13 @@ import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
-from shapely import wkt
 import csv
 import numpy as np
+from data_loader import read_geo_csv, load_year
+from render import parse_render_args
+from normalize import normalize_values
+from run_report import start_report, stage, frame_done, write_report
+import time
 
 
 ############################
@@ -41,18 +45,16 @@ import numpy as np
 ## Main
 ############################
 
-# read in parks data file
-parks_data_file = 'parks_data.csv'
+# command line options, the maps are only shown with --preview
+args = parse_render_args('Maps of the St. Louis tract demographics and household income for every census year')
 
-parks_data_csv = pd.read_csv(parks_data_file)
-parks_data = gpd.GeoDataFrame(parks_data_csv)
+# time the stages of the run for the run report
+start_report(profile=args.profile)
 
-# set the names as the index
-parks_data.set_index("name", inplace=True)
+# read in parks data file
+parks_data_file = 'parks_data.csv'
 
-# set the geometry column to the geometry
-parks_data['geometry'] = parks_data['geometry'].apply(wkt.loads)
-parks_data.set_geometry('geometry')
+parks_data = read_geo_csv(parks_data_file, 'name')
 
 # change the extra data colors
 parks_data['color'] = 'green'
@@ -93,10 +95,16 @@ ax1[1].annotate('Forest Park', xy=(ct.x, ct.y), rotation=-6, size=9, va='center'
 years = ['1900','1930','1940','1950','1960','1970','1980', '1990','2000',
 		'2010','2011','2012','2013','2014','2015','2016','2017','2018','2018']
 
+# income colors between the lowest and highest income ('minmax'), the 4th lowest and highest
+# with the outliers clipped ('clip') or the lowest and highest log income ('log')
+inc_mode = 'minmax'
+
 count = 0
 vid_count = 0
 for year in years:
 
+	frame_start = time.perf_counter()
+
 	# demographic variables
 	dem_color = 'dem_color'
 	name_dem = 'white'
@@ -106,26 +114,9 @@ for year in years:
 	inc_color = 'inc_color'
 	name_inc = 'median income per household'
 
-	# read in the data file
-	data_file = year + '_data.csv'
-
-	# data 2010 to 2018 are ACS (American Community Survey) estimates 
-	if int(year) > 2009:
-		data_file = year + '_data_ACS_estimates.csv'
-
-	
-	data_csv = pd.read_csv(data_file)
-	data = gpd.GeoDataFrame(data_csv)
-
-	# set the tracts as the index
-	data.set_index("tract", inplace=True)
-
-	# set the geometry column to the geometry
-	data['geometry'] = data['geometry'].apply(wkt.loads)
-	data = data.set_geometry('geometry')
-
-	# initialize demogaphric colors by normalizing by population
-	data[dem_color] = data[name_dem].values / data[name_pop].values
+	# read in the data file with the demographic colors (2010 to 2018 are ACS estimates)
+	with stage('load'):
+		data = load_year(year, name_dem, name_pop)
 
 	""" Us this if name_inc = 'income per capita'
 	# calculate income per capita from mean income per household and people per household
@@ -137,45 +128,10 @@ for year in years:
 		data[name_inc] = data['median income per household'].values / data['people per household'].values
 	"""
 
-	# determine income colors and finding missing data
-
-	"""
-	# determine four highest and lowest values to make outliers less prominent in color scheme
-	four_high = data[name_inc].nlargest(4)
-	four_low = data[name_inc].nsmallest(4)
-
-	max_inc = four_high.min()
-	min_inc = four_low.max()
-	"""
-
-	# apply function to distinguish colors easier by reducing significance of outliers if necessary
-	#data[name_inc] = np.log(data[name_inc])
-
-	max_inc = data[name_inc].max()
-	min_inc = data[name_inc].min()
-
-	# normalize income data
-	data[inc_color] = (data[name_inc].values - min_inc) / (max_inc - min_inc)
-
-	# if value greater than 1 change to 1 (only necessary if normalizing by non largest number)
-	#data[inc_color].loc[data[inc_color]>1] = 1.0
-
-	# if value less than 0 change to 0 (only necessary if normalizing by non smallest number)
-	#data[inc_color].loc[data[inc_color]<0] = 0.0
-
-	# check for missing data or zeros
-	inc_names = []
-
-	for name in data.index:
-		color_val = data.loc[name][inc_color].item()
-		if color_val!=color_val: # nan does not equal itself
-			#print(year, name, color_val)
-			color_val = 0
-			inc_names.append(name)
-		data.at[name, inc_color] = color_val
-
-	# make list of names with no data into numpy arrays for easier use
-	inc_names = np.array(inc_names)
+	# determine income colors and finding missing data (NaN), income colors are 0 to 1
+	with stage('normalize'):
+		inc_colors, no_inc = normalize_values(data[name_inc].values, mode=inc_mode)
+		data[inc_color] = inc_colors
 
 	## plot demographic data
 	data.plot(column=dem_color,cmap='gray', edgecolor='black', ax=ax1[0], legend=False)
@@ -185,8 +141,8 @@ for year in years:
 
 
 	# copy shape dataframe of neighborhoods with no data and add to plot
-	if len(inc_names) != 0:
-		inc_no_data = gpd.GeoDataFrame(data, index=inc_names)
+	if no_inc.any():
+		inc_no_data = data[no_inc]
 		inc_no_data.plot(color='r', edgecolor='black', ax=ax1[1])
 
 	
@@ -225,21 +181,27 @@ for year in years:
 	fig1.suptitle(year, x=0.5, y=0.9, fontsize=18)
 	
 	# pause for viewing
-	plt.show(block=False)
-	plt.pause(1)
+	if args.preview:
+		plt.show(block=False)
+		plt.pause(1)
 
 	# save the images by increasing the name by one for each frame
-	"""
-	vid_count = vid_count + 1
-	vid_num = str(vid_count).zfill(5)
-	savename = 'video/STLouis_' + vid_num + '.png'
-	plt.savefig(savename, dpi=100)
-	"""
+	if args.save:
+		vid_count = vid_count + 1
+		vid_num = str(vid_count).zfill(5)
+		with stage('encode'):
+			savename = 'video/STLouis_' + vid_num + '.png'
+			plt.savefig(savename, dpi=100)
+
+	frame_done(time.perf_counter() - frame_start)
 
 #plt.show()
-plt.pause(5)
+if args.preview:
+	plt.pause(5)
 plt.close()
 
+write_report(__file__, args.report)
+
 
 #### String together as video using ffmpeg
 # ffmpeg -r 2 -f image2 -s 1400x1200 -start_number 3 -i STLouis_%05d.png -vframes 16 -vcodec libx264 -crf 15 -pix_fmt yuv420p out.mp4
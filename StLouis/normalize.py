@@ -0,0 +1,67 @@
+# St. Louis Neighborhoods and tracts
+# normalize tract values (e.g. income) between 0 and 1 for the map colors
+# and find the tracts without data, for all tracts at once
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+
+
+############################
+## Constants
+############################
+
+# number of highest and lowest values treated as outliers by the 'clip' mode
+outliers = 4
+
+
+############################
+## Functions
+############################
+
+# normalize values between 0 and 1, returns (colors, no_data) where no_data is True for the
+# values without data (NaN), which get color 0
+# mode is
+#   'minmax': between the lowest and highest value
+#   'clip': between the outliers-th lowest and highest value, the values beyond them are
+#       clipped to 0 and 1 so the outliers are less prominent in the color scheme
+#   'log': between the lowest and highest log value, values of 0 or less have no data
+def normalize_values(values, mode='minmax', outliers=outliers):
+
+	values = np.asarray(values, dtype=float)
+
+	if mode == 'log':
+		values = np.log(np.where(values > 0, values, np.nan))
+
+	elif mode not in ('minmax', 'clip'):
+		raise ValueError("unknown normalization mode '" + str(mode) + "', use 'minmax', 'clip' or 'log'")
+
+	known = values[~np.isnan(values)]
+	if len(known) == 0:
+		return np.zeros(len(values)), np.ones(len(values), dtype=bool)
+
+	if mode == 'clip':
+		# the outliers-th lowest and highest value, nsmallest(outliers).max() and nlargest(outliers).min()
+		ordered = np.sort(known)
+		num = min(outliers, len(ordered))
+		min_val = ordered[num-1]
+		max_val = ordered[-num]
+
+	else:
+		min_val = known.min()
+		max_val = known.max()
+
+	# all values the same gives 0/0, which counts as no data like a missing value
+	with np.errstate(invalid='ignore', divide='ignore'):
+		colors = (values - min_val) / (max_val - min_val)
+
+	if mode == 'clip':
+		colors = np.clip(colors, 0.0, 1.0)
+
+	no_data = np.isnan(colors)
+	colors[no_data] = 0.0
+
+	return colors, no_data
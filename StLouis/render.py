@@ -0,0 +1,674 @@
+# St. Louis Neighborhoods and tracts
+# draw the box maps for the videos
+# the boxes are drawn once per year, the frames in between only change the box colors
+# frames are described by chunks so they can be drawn in order or by a pool of processes
+# saved frames only rasterize the boxes, everything on top of them (parks, boundary, legends,
+# title) is rasterized once per year and composited over the boxes with numpy
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+from matplotlib.image import AxesImage
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import collections
+import subprocess
+import shutil
+import argparse
+import time
+import io
+import os
+from data_loader import read_geo_csv
+from box_grid import load_grid
+from year_values import use_fork
+from run_report import stage, count, frame_done, start_report, take_timings, merge_timings
+from frame_store import mark_rendered, finish_render
+
+
+############################
+## Constants
+############################
+
+# video output, the frames are 1400x1200 pixels (14x12 inch figure at 100 dpi)
+video_file = 'video/StLouis_demographics_video_interpolated.mp4'
+video_dpi = 100
+video_fps = 10
+
+# frames per mp4 segment of a resumable render, a crash loses at most the segment being written
+segment_frames = 250
+
+# figure and map layers of a frame worker process
+worker_state = {}
+
+
+############################
+## Functions
+############################
+
+# command line of the mapping scripts, the figures are drawn headless (Agg backend, no
+# pauses) unless --preview is given, so a batch run never waits on a window
+# video scripts also take the output format and the number of worker processes, the
+# defaults are the settings at the top of the script
+def parse_render_args(description, output_format=None, workers=None, argv=None):
+
+	parser = argparse.ArgumentParser(description=description)
+	parser.add_argument('--preview', action='store_true',
+			help='show the frames in a window while drawing them (slow)')
+
+	if workers is not None:
+		parser.add_argument('--output', choices=['mp4', 'png', 'none'], default=output_format or 'none',
+				help='mp4 streams the frames to ffmpeg, png saves video/NNNNN.png, none only draws them')
+		parser.add_argument('--workers', type=int, default=workers,
+				help='processes drawing the frames, with more than one the frames are not shown')
+		parser.add_argument('--restart', action='store_true',
+				help='start the render again from the first frame instead of resuming')
+
+	else:
+		parser.add_argument('--save', action='store_true',
+				help='save every frame as a png file in the video folder')
+
+	parser.add_argument('--report', default=None,
+			help='json file for the run report (stage times, frame times, peak memory), '
+			'default cache/reports/<script>_<time>.json')
+	parser.add_argument('--profile', action='store_true',
+			help='profile the stages with cProfile and save the profile of the slowest one next to the report')
+
+	args = parser.parse_args(argv)
+
+	if workers is not None and args.output == 'none':
+		args.output = None
+
+	if not args.preview:
+		plt.switch_backend('Agg')
+
+	return args
+
+
+# parks (green), river (blue), Delmar Blvd (red, drawn only on the last frame) and the city boundary
+def load_map_layers():
+
+	parks_data = read_geo_csv('parks_data.csv', 'name')
+
+	# change the extra data colors
+	parks_data['color'] = 'green'
+	parks_data.loc['river', 'color'] = 'blue'
+	parks_data.loc['Delmar', 'color'] = 'red'
+
+	# take out Delmar and place in at end
+	delmar_df = parks_data.loc[['Delmar'],:].copy()
+	parks_data = parks_data.drop('Delmar')
+
+	# St. Louis boundary data
+	stl_data = read_geo_csv('stl_boundary.csv', 'Name')
+
+	return parks_data, delmar_df, stl_data
+
+
+# figure with the map axes, the demographic color bar and its label, frames are saved at dpi
+def setup_figure(label, dpi=video_dpi):
+
+	# create the demographic color bar mapping
+	c_dem = plt.cm.ScalarMappable(cmap='gray')
+
+	# initialize time variant figure, at the video dpi so the canvas has the size of a frame
+	fig1, ax1 = plt.subplots(figsize=(14,12), ncols=2, dpi=dpi)
+
+	# demographic axes parameters and color bar
+	dem_bar = fig1.colorbar(c_dem, ax=ax1[0], shrink=0.5, ticks=[0.01,0.5,0.99])
+	dem_bar.ax.set_yticklabels(['0','50','100'])
+
+	# add a label to the figure
+	fig1.text(0.20,0.8, label, fontsize=12)
+
+	return fig1, ax1
+
+
+# draw the boxes as a single collection colored by vals, returns (collection, part_box)
+# multipolygon boxes are split into one patch per part and part_box maps the parts to boxes
+def plot_box_layer(ax, boxes_data, vals, cmap='gray', linewidth=0.05):
+
+	parts = boxes_data.geometry.reset_index(drop=True).explode(index_parts=False)
+	part_box = parts.index.values
+
+	parts.plot(ax=ax, edgecolor='face', linewidth=linewidth)
+	collection = ax.collections[-1]
+	collection.set_cmap(cmap)
+
+	box_layer = (collection, part_box)
+	update_box_layer(box_layer, vals)
+
+	return box_layer
+
+
+# recolor the boxes, scaled between the lowest and highest value like GeoDataFrame.plot(column=)
+# boxes without a value (NaN) are left transparent
+def update_box_layer(box_layer, vals):
+
+	collection, part_box = box_layer
+	vals = np.asarray(vals, dtype=float)
+
+	collection.set_array(vals[part_box])
+	collection.set_clim(np.nanmin(vals), np.nanmax(vals))
+
+
+# draw the city pixels of a raster grid (box_grid.raster_grid) as one image colored by vals,
+# returns (image, grid), pixels outside the city are NaN and left transparent
+# the image is drawn below the parks, river and boundary
+def plot_raster_layer(ax, grid, vals, cmap='gray'):
+
+	pixels = np.full(grid['mask'].shape, np.nan, dtype=np.float32)
+
+	image = ax.imshow(pixels, extent=grid['extent'], origin='upper', cmap=cmap,
+			interpolation='nearest', aspect='auto', zorder=0)
+
+	# keep the usual margins around the map like the box collection (images stick to the axes edges)
+	image.sticky_edges.x.clear()
+	image.sticky_edges.y.clear()
+
+	raster_layer = (image, grid)
+	update_raster_layer(raster_layer, vals)
+
+	return raster_layer
+
+
+# recolor the city pixels, scaled between the lowest and highest value like the boxes
+def update_raster_layer(raster_layer, vals):
+
+	image, grid = raster_layer
+	vals = np.asarray(vals, dtype=float)
+
+	pixels = image.get_array()
+	pixels[grid['mask']] = vals
+	image.set_data(pixels)
+	image.set_clim(np.nanmin(vals), np.nanmax(vals))
+
+
+# draw the grid as boxes or as a raster image, depending on the kind of grid (box_grid.load_grid)
+def plot_grid_layer(ax, grid, vals):
+
+	if isinstance(grid, dict):
+		return plot_raster_layer(ax, grid, vals)
+
+	return plot_box_layer(ax, grid, vals)
+
+
+# recolor a layer from plot_grid_layer
+def update_grid_layer(grid_layer, vals):
+
+	if isinstance(grid_layer[0], AxesImage):
+		update_raster_layer(grid_layer, vals)
+
+	else:
+		update_box_layer(grid_layer, vals)
+
+
+# everything on the map that does not change between the frames of a year:
+# Forest Park label, parks and river, city boundary and the legends
+def draw_static_layers(ax1, parks_data, stl_data, year):
+
+	# add Forest Park label
+	ct = parks_data.loc['Forest Park'].geometry.centroid
+	ax1[0].annotate('Forest Park', xy=(ct.x, ct.y), rotation=-6, size=9, va='center', ha='center')
+
+	# turn off axis
+	ax1[0].set_axis_off()
+	ax1[1].set_axis_off()
+
+	# add parks data
+	parks_data.plot(color=parks_data.color, edgecolor='black', ax=ax1[0], linewidth=1)
+
+	# add St. Louis boundary
+	stl_data.geometry.boundary.plot(color=None, edgecolor='black', ax=ax1[0], linewidth=1.2)
+
+	# add annotation as a legend for data source
+	data_source = 'Data Source: U.S. Census'
+	if int(year) > 2009:
+		data_source = 'Data Source: American Community Survey'
+
+	fake_line = Line2D([0], [0], color='white', lw=1)
+	ax1[0].legend([fake_line], [data_source], loc=3, bbox_to_anchor=(-0.3,-0.023), frameon=False)
+
+	# add custom legend for parks and river
+	custom_lines = [Line2D([0], [0], color='g', lw=10), Line2D([0], [0], color='blue', lw=10)]
+	ax1[1].legend(custom_lines, ['Parks', 'Mississippi River'], loc=3, bbox_to_anchor=(-0.6,-0.05), frameon=False)
+
+
+# arrow, text and bold red line to show the Delmar divide on the last frame
+def draw_delmar(ax1, delmar_df):
+
+	ax1[0].annotate('Delmar Blvd', fontsize=12,
+		xy=(0.26, 0.51), xycoords='axes fraction', xytext=(0.12,0.63),
+		arrowprops=dict(facecolor='red', shrink=0, lw=0.8),
+		horizontalalignment='right', verticalalignment='top')
+
+	# add Delmar Blvd in bold red
+	delmar_df.plot(color='red', edgecolor='red', ax=ax1[0], linewidth=4)
+
+
+# x / 255 rounded to the nearest integer for uint16 x up to 255*255, without a division
+def div255(x):
+
+	x = x + 128
+	return (x + (x >> 8)) >> 8
+
+
+# the figure without the boxes (parks, river, boundary, legends, labels, title and Delmar Blvd)
+# rasterized once, the image only changes with the year so it is cached in state by figure
+# size, dpi, year and Delmar
+# the frames come in order, so only the overlay of the current year is kept (about 7 MB each)
+# returns a dict with the whole frame except the boxes ('base', the overlay over the figure
+# background), the pixel window of the map axes ('window', the boxes are clipped to it) and
+# the overlay pixels in that window to blend over the boxes of every frame ('pixels' as flat
+# indices in the window, 'rgb' premultiplied by the alpha and 'rest' = 255 - alpha)
+def static_overlay(fig1, ax, state, year, delmar):
+
+	key = (tuple(fig1.get_size_inches()), fig1.dpi, year, delmar)
+	overlays = state.setdefault('overlays', {})
+
+	if key in overlays:
+		return overlays[key]
+
+	overlays.clear()
+
+	layer = state['grid_layer'][0]
+	facecolor = fig1.get_facecolor()
+
+	layer.set_visible(False)
+	fig1.set_facecolor('none')
+	fig1.canvas.draw()
+	state['drawn'] = True
+
+	# the Agg canvas keeps the colors and alpha apart (not premultiplied)
+	overlay = np.array(fig1.canvas.buffer_rgba())
+
+	layer.set_visible(True)
+	fig1.set_facecolor(facecolor)
+
+	background = np.round(255*np.asarray(facecolor[:3])).astype(np.uint16)
+	rgb = overlay[:, :, :3]*overlay[:, :, 3:].astype(np.uint16)
+	rest = 255 - overlay[:, :, 3:].astype(np.uint16)
+
+	base = np.full(overlay.shape, 255, dtype=np.uint8)
+	base[:, :, :3] = div255(rgb + background*rest)
+
+	# axes bbox in pixels from the bottom left, rows of the canvas start at the top
+	height, width = overlay.shape[:2]
+	x0, y0, x1, y1 = ax.bbox.extents
+	window = (max(height - int(np.ceil(y1)), 0), min(height - int(np.floor(y0)), height),
+			max(int(np.floor(x0)), 0), min(int(np.ceil(x1)), width))
+
+	row0, row1, col0, col1 = window
+	pixels = np.flatnonzero(rest[row0:row1, col0:col1, 0] != 255)
+
+	overlays[key] = {'base': base, 'background': background, 'window': window, 'pixels': pixels,
+			'rgb': rgb[row0:row1, col0:col1].reshape(-1, 3)[pixels],
+			'rest': rest[row0:row1, col0:col1].reshape(-1, 1)[pixels]}
+
+	return overlays[key]
+
+
+# the boxes (or raster image) alone on a transparent canvas, drawn with the renderer of
+# the last full draw of the figure, returns a (height, width, 4) uint8 view of the canvas
+def grid_layer_pixels(fig1, ax, state):
+
+	renderer = fig1.canvas.get_renderer()
+	renderer.clear()
+	ax.draw_artist(state['grid_layer'][0])
+
+	return np.asarray(renderer.buffer_rgba())
+
+
+# frame pixels (height, width, 4) uint8 from the boxes and the static overlay
+# only the map axes window is blended, the rest of the frame is the same for the whole year
+def composite_frame(layer, overlay):
+
+	row0, row1, col0, col1 = overlay['window']
+	boxes = layer[row0:row1, col0:col1]
+
+	# boxes over the figure background, then the overlay pixels over the boxes
+	alpha = boxes[:, :, 3:].astype(np.uint16)
+	rgb = div255(boxes[:, :, :3]*alpha + overlay['background']*(255 - alpha)).reshape(-1, 3)
+	rgb[overlay['pixels']] = div255(overlay['rgb'] + rgb[overlay['pixels']]*overlay['rest'])
+
+	frame = overlay['base'].copy()
+	frame[row0:row1, col0:col1, :3] = rgb.reshape(row1 - row0, col1 - col0, 3)
+
+	return frame
+
+
+# ffmpeg reading raw RGBA frames from stdin and encoding them to an mp4
+# same settings as the ffmpeg command used to stitch the older png frames together
+def open_video(video_file, fig_size=(14,12), dpi=video_dpi, fps=video_fps):
+
+	frame_size = str(int(fig_size[0]*dpi)) + 'x' + str(int(fig_size[1]*dpi))
+
+	cmd = ['ffmpeg', '-y', '-loglevel', 'error',
+			'-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', frame_size, '-r', str(fps), '-i', '-',
+			'-vcodec', 'libx264', '-crf', '15', '-pix_fmt', 'yuv420p', video_file]
+
+	return subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+
+# wait for ffmpeg to finish writing the video
+def close_video(video):
+
+	video.stdin.close()
+
+	if video.wait() != 0:
+		raise RuntimeError('ffmpeg failed with exit code ' + str(video.returncode))
+
+
+# join the mp4 segments of a resumed render into video_file without encoding them again
+def join_video_parts(parts, video_file):
+
+	if len(parts) == 1:
+		os.replace(parts[0], video_file)
+		return
+
+	list_file = video_file + '.parts.txt'
+	with open(list_file, 'w') as f:
+		for part in parts:
+			f.write("file '" + os.path.abspath(part) + "'\n")
+
+	subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+			'-i', list_file, '-c', 'copy', video_file], check=True)
+
+	os.remove(list_file)
+	for part in parts:
+		os.remove(part)
+
+
+# where the finished frames go, a dict with the output format ('mp4', 'png' or None), the
+# running ffmpeg process and the frame store recording the finished frames (None to not resume)
+# with a store the mp4 is written in segments of segment_frames, which are joined at the end
+# fps and dpi are the frame rate and frame size (dpi of the 14x12 inch figure) of the mp4
+def open_output(output_format, video_file=video_file, store=None, fps=video_fps, dpi=video_dpi):
+
+	if output_format == 'mp4' and shutil.which('ffmpeg') is None:
+		raise RuntimeError("ffmpeg was not found, use output 'png' (--output png) to save the frames instead")
+
+	return {'format': output_format, 'video_file': video_file, 'store': store, 'fps': fps, 'dpi': dpi,
+			'video': None, 'part': None, 'part_frames': 0, 'frame': 0}
+
+
+# output of render_chunk for the next chunk: the ffmpeg stdin for mp4 (starting a new
+# segment if needed), otherwise the output format itself
+def output_target(output, frame):
+
+	if output['format'] != 'mp4':
+		return output['format']
+
+	if output['video'] is None:
+		output['part'] = output['video_file']
+		if output['store'] is not None:
+			output['part'] = os.path.splitext(output['video_file'])[0] + '.' + str(frame).zfill(5) + '.mp4'
+
+		output['video'] = open_video(output['part'], dpi=output['dpi'], fps=output['fps'])
+
+	return output['video'].stdin
+
+
+# close the mp4 segment being written and record its frames as finished
+def close_segment(output):
+
+	close_video(output['video'])
+	mark_rendered(output['store'], output['frame'], part=output['part'])
+
+	output['video'] = None
+	output['part_frames'] = 0
+
+
+# record the frames of a chunk as finished once they are written
+def chunk_written(output, chunk):
+
+	output['frame'] = chunk['frame'] + len(chunk['values']) - 1
+	output['part_frames'] = output['part_frames'] + len(chunk['values'])
+
+	if output['store'] is None or output['format'] is None:
+		return
+
+	if output['format'] == 'png':
+		mark_rendered(output['store'], output['frame'])
+
+	elif output['part_frames'] >= segment_frames:
+		close_segment(output)
+
+
+# finish the video, with a store the segments are joined and the render marked as complete
+def close_output(output):
+
+	if output['store'] is None:
+		if output['video'] is not None:
+			close_video(output['video'])
+		return
+
+	if output['video'] is not None:
+		close_segment(output)
+
+	if output['format'] == 'mp4':
+		join_video_parts(output['store']['manifest']['render']['parts'], output['video_file'])
+
+	finish_render(output['store'])
+
+
+# draw (and save) the frames of a chunk on the figure
+# the whole map is only drawn when the year changes, other frames recolor the boxes
+# state remembers the year and box collection (or raster image) on the figure between chunks
+# output is 'png' to save video/NNNNN.png, a file (e.g. the ffmpeg stdin) to write the raw
+# RGBA pixels of each frame to, or None to not save the frames
+# frames are saved at dpi (the dpi of the mp4 in open_video), not at the dpi of the figure
+# which a HiDPI window scales by its pixel ratio
+def render_chunk(fig1, ax1, map_layers, boxes_data, state, chunk, output=None,
+		pause_time=None, redraw_frames=False, dpi=video_dpi):
+
+	parks_data, delmar_df, stl_data = map_layers
+
+	for ind, vals in enumerate(chunk['values']):
+
+		frame_start = time.perf_counter()
+
+		with stage('draw'):
+			if redraw_frames or state.get('year') != chunk['year']:
+				ax1[0].cla()
+				ax1[1].cla()
+
+				## plot demographic data with the parks, boundary and legends on top
+				state['grid_layer'] = plot_grid_layer(ax1[0], boxes_data, vals)
+				draw_static_layers(ax1, parks_data, stl_data, chunk['year'])
+
+				# year as figure title
+				fig1.suptitle(chunk['year'], x=0.5, y=0.9, fontsize=18)
+				state['year'] = chunk['year']
+				state['drawn'] = False
+				count('full redraws')
+
+			else:
+				update_grid_layer(state['grid_layer'], vals)
+
+			if chunk['delmar']:
+				draw_delmar(ax1, delmar_df)
+
+				# the map has to be drawn again for any later frame
+				state['year'] = None
+
+		# pause for viewing
+		if pause_time is not None:
+			plt.show(block=False)
+			plt.pause(pause_time)
+
+		# saved frames are composited from the boxes and the cached static overlay, shown
+		# frames are drawn in full by savefig (rasterizing the figure happens there)
+		composite = output is not None and pause_time is None
+
+		if composite:
+			with stage('draw'):
+				overlay = static_overlay(fig1, ax1[0], state, chunk['year'], chunk['delmar'])
+
+				# a map drawn again with its overlay cached is still drawn once for the axes limits
+				if not state['drawn']:
+					fig1.canvas.draw()
+					state['drawn'] = True
+
+				layer = grid_layer_pixels(fig1, ax1[0], state)
+
+		with stage('encode'):
+
+			if composite:
+				pixels = composite_frame(layer, overlay)
+
+			# save the images with the frame number
+			if output == 'png':
+				savename = 'video/' + str(chunk['frame'] + ind).zfill(5) + '.png'
+				if composite:
+					plt.imsave(savename, pixels, dpi=dpi)
+				else:
+					fig1.savefig(savename, dpi=dpi)
+
+			# or stream the pixels without encoding a png
+			elif output is not None:
+				if composite:
+					output.write(pixels.tobytes())
+				else:
+					fig1.savefig(output, format='rgba', dpi=dpi)
+
+		count('frames')
+		frame_done(time.perf_counter() - frame_start)
+
+
+# draw all frames in order on one figure
+# output_format is 'mp4' to write video_file with ffmpeg, 'png' to save every frame
+# in the video folder (for debugging) or None to only show the frames
+# store is the frame store of the chunks (frame_store.resume_chunks) to record the finished
+# frames in, so an interrupted render can resume
+# fps and dpi are the frame rate of the mp4 and the resolution of the frames
+def render_frames(chunks, boxes_data, label, output_format='mp4', video_file=video_file,
+		pause_time=None, redraw_frames=False, store=None, fps=video_fps, dpi=video_dpi):
+
+	map_layers = load_map_layers()
+	fig1, ax1 = setup_figure(label, dpi=dpi)
+	state = {}
+
+	output = open_output(output_format, video_file=video_file, store=store, fps=fps, dpi=dpi)
+
+	for chunk in chunks:
+		render_chunk(fig1, ax1, map_layers, boxes_data, state, chunk,
+				output=output_target(output, chunk['frame']), pause_time=pause_time,
+				redraw_frames=redraw_frames, dpi=dpi)
+		chunk_written(output, chunk)
+
+	close_output(output)
+
+	return fig1
+
+
+# set up the figure and map layers once in every worker process
+# values_file is the memory mapped frame values of a frame store, read by every worker
+# without copying
+def init_frame_worker(boxes_file, label, output_format, values_file=None, dpi=video_dpi):
+
+	plt.switch_backend('Agg')
+
+	# the timings of the parent process before the fork are not the worker's
+	start_report()
+
+	if values_file is not None:
+		worker_state['values'] = np.load(values_file, mmap_mode='r')
+
+	worker_state['boxes_data'] = load_grid(boxes_file)
+	worker_state['map_layers'] = load_map_layers()
+	worker_state['figure'] = setup_figure(label, dpi=dpi)
+	worker_state['output_format'] = output_format
+	worker_state['dpi'] = dpi
+	worker_state['state'] = {}
+
+
+# draw a chunk in a worker, returns the raw pixels of its frames for the mp4 output and
+# the stage timings of the chunk
+def render_chunk_worker(chunk):
+
+	fig1, ax1 = worker_state['figure']
+
+	# chunks from a frame store only carry the frame numbers
+	if chunk['values'] is None:
+		row = chunk['frame'] - 1
+		chunk = dict(chunk, values=worker_state['values'][row:row+chunk['frames']])
+
+	output = worker_state['output_format']
+	if output == 'mp4':
+		output = io.BytesIO()
+
+	render_chunk(fig1, ax1, worker_state['map_layers'], worker_state['boxes_data'],
+			worker_state['state'], chunk, output=output, dpi=worker_state['dpi'])
+
+	pixels = None
+	if worker_state['output_format'] == 'mp4':
+		pixels = output.getvalue()
+
+	return pixels, take_timings()
+
+
+# append the frames of a chunk finished by a worker to the video
+def write_chunk(output, chunk, future):
+
+	pixels, timings = future.result()
+	merge_timings(timings)
+
+	target = output_target(output, chunk['frame'])
+	if output['format'] == 'mp4':
+		target.write(pixels)
+
+	chunk_written(output, chunk)
+
+
+# draw all frames using a pool of processes, each with its own figure
+# png file names come from the frame numbers and mp4 frames are written in frame order,
+# so the output is the same for any worker count
+# with a frame store the workers read the frame values from its memory map
+# without fork (year_values.use_fork) the frames are drawn in this process by render_frames
+def render_frames_parallel(chunks, boxes_file, label, workers=None, output_format='mp4',
+		video_file=video_file, store=None, fps=video_fps, dpi=video_dpi):
+
+	if not use_fork:
+		return render_frames(chunks, load_grid(boxes_file), label, output_format=output_format,
+				video_file=video_file, store=store, fps=fps, dpi=dpi)
+
+	if workers is None:
+		workers = os.cpu_count()
+
+	output = open_output(output_format, video_file=video_file, store=store, fps=fps, dpi=dpi)
+
+	values_file = None
+	if store is not None:
+		values_file = store['values_file']
+
+	# parse the map layers into the GeoParquet cache once, so the workers only read it
+	load_map_layers()
+
+	# fork so the workers do not run the calling script again on start up
+	context = multiprocessing.get_context('fork')
+
+	with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_frame_worker,
+			initargs=(boxes_file, label, output_format, values_file, dpi)) as executor:
+
+		# only a few chunks are rendered ahead of the one being written, so the
+		# finished frames waiting for their turn do not fill up the memory
+		pending = collections.deque()
+		for chunk in chunks:
+			work = chunk
+			if store is not None:
+				work = dict(chunk, values=None)
+
+			pending.append((chunk, executor.submit(render_chunk_worker, work)))
+
+			if len(pending) >= 2*workers:
+				write_chunk(output, *pending.popleft())
+
+		while len(pending) != 0:
+			write_chunk(output, *pending.popleft())
+
+	close_output(output)
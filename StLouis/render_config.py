@@ -0,0 +1,276 @@
+# St. Louis Neighborhoods and tracts
+# settings of a video render read from a TOML or YAML file (python -m StLouis render <file>)
+# every setting has the default of the video scripts, so a file only lists the ones it changes
+# the settings are checked before anything is loaded, so a mistake in a sweep of renders
+# shows up at once and not after the years are interpolated
+
+
+############################
+## Imports
+############################
+
+import importlib.util
+import shutil
+import json
+import csv
+import os
+from data_loader import data_dir, year_file
+
+# TOML is read by the standard library from python 3.11 on
+try:
+	import tomllib
+	use_toml = True
+except ImportError:
+	use_toml = False
+
+# YAML needs PyYAML, only looked up here and imported when a YAML file is read
+use_yaml = importlib.util.find_spec('yaml') is not None
+
+
+############################
+## Constants
+############################
+
+# settings of a render with the defaults of parallel_interpolation_mapping.py
+default_config = {
+	'grid': 'boundaries201.csv',  # box grid file in the data directory or 'raster<n>'
+	'years': ['1930','1940','1950','1960','1970','1980','1990','2000',
+			'2010','2011','2012','2013','2014','2015','2016','2017','2018'],
+	'variable': 'white',  # tract column shown on the map
+	'population': 'population',  # tract column the counts are divided by
+	'label': None,  # label of the color bar, None for '% Population <Variable>'
+	'method': 'idw',  # 'idw', 'assign' or 'areal' (year_values.year_box_values)
+	'rates': 'population',  # 'population', 'tract' or 'legacy' (year_values.year_box_values)
+	'lowest_vals': 4,  # nearest tracts of every box for 'idw'
+	'timeline': 'pchip',  # 'pchip', 'linear' or 'legacy' between the years (timeline.build_timeline)
+	'interpolate': True,  # frames between the years, False shows only the years
+	'frames_per_year': 20,
+	'fps': 10,  # frame rate of the mp4 (render.video_fps)
+	'dpi': 100,  # frames are 14x12 inches at this dpi (render.video_dpi)
+	'workers': 1,  # processes drawing the frames
+	'year_workers': None,  # processes preparing the years, None for one per cpu (one without fork)
+	'output': 'mp4',  # 'mp4', 'png' (video/NNNNN.png) or 'none'
+	'video_file': None,  # None for video/StLouis_<variable>_<method>.mp4
+	'resume': True,  # continue an interrupted render
+	'redraw_frames': False,
+	'pause_time': 0.25,  # seconds each frame is shown with --preview
+}
+
+# settings with a fixed set of values
+config_choices = {
+	'method': ['idw', 'assign', 'areal'],
+	'rates': ['population', 'tract', 'legacy'],
+	'timeline': ['pchip', 'linear', 'legacy'],
+	'output': ['mp4', 'png', 'none', None],
+}
+
+# settings that are whole numbers with their lowest value, None allowed for year_workers
+config_counts = {'lowest_vals': 1, 'fps': 1, 'dpi': 10, 'workers': 1, 'year_workers': 1}
+
+config_flags = ['interpolate', 'resume', 'redraw_frames']
+
+# columns that count people, shown as a percentage of the population
+percent_columns = ['white', 'black', 'people of color']
+
+
+############################
+## Functions
+############################
+
+# settings of a config file by its extension (.toml, .yaml, .yml or .json)
+def read_config_file(path):
+
+	ext = os.path.splitext(path)[1].lower()
+
+	if ext == '.toml':
+		if not use_toml:
+			raise RuntimeError('reading TOML needs python 3.11 or newer, use a YAML or json config')
+		with open(path, 'rb') as f:
+			return tomllib.load(f)
+
+	if ext in ('.yaml', '.yml'):
+		if not use_yaml:
+			raise RuntimeError('reading YAML needs PyYAML (pip install pyyaml), use a TOML or json config')
+		import yaml
+		with open(path) as f:
+			return yaml.safe_load(f) or {}
+
+	if ext == '.json':
+		with open(path) as f:
+			return json.load(f)
+
+	raise ValueError("unknown config file type '" + ext + "', use .toml, .yaml or .json")
+
+
+# setting from a KEY=VALUE string of the command line, the value is read as json
+# (numbers, true/false, lists) and is a string otherwise, e.g. workers=8 or output=png
+def parse_setting(text):
+
+	if '=' not in text:
+		raise ValueError("setting '" + text + "' is not KEY=VALUE")
+
+	key, value = text.split('=', 1)
+
+	try:
+		value = json.loads(value)
+	except ValueError:
+		pass
+
+	return key.strip(), value
+
+
+# column names in the header of a csv file in the data directory
+def csv_columns(filename):
+
+	with open(os.path.join(data_dir, filename), newline='') as f:
+		return next(csv.reader(f))
+
+
+# True when a csv file in the data directory has a tract shape in its geometry column
+# (1910 and 1920 only have the ward values, without shapes)
+def has_shapes(filename):
+
+	with open(os.path.join(data_dir, filename), newline='') as f:
+		return any(row.get('geometry') for row in csv.DictReader(f))
+
+
+# whole number that is not a bool (True is an int in python)
+def is_count(value):
+
+	return isinstance(value, int) and not isinstance(value, bool)
+
+
+# int or float that is not a bool
+def is_number(value):
+
+	return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+# config with the defaults filled in and the values checked, raises a ValueError listing
+# every problem
+# years become strings, output 'none' becomes None and the label and video file get their defaults
+def validate_config(config):
+
+	errors = []
+
+	unknown = sorted(set(config) - set(default_config))
+	if len(unknown) != 0:
+		errors.append('unknown settings ' + ', '.join(unknown))
+
+	config = dict(default_config, **{key: value for key, value in config.items() if key in default_config})
+
+	for key, choices in config_choices.items():
+		if config[key] not in choices:
+			errors.append(key + " is '" + str(config[key]) + "', use one of "
+					+ ', '.join(choice for choice in choices if choice is not None))
+
+	for key, lowest in config_counts.items():
+		if key == 'year_workers' and config[key] is None:
+			continue
+		if not is_count(config[key]) or config[key] < lowest:
+			errors.append(key + ' is ' + repr(config[key]) + ', use a whole number of at least ' + str(lowest))
+
+	for key in config_flags:
+		if not isinstance(config[key], bool):
+			errors.append(key + ' is ' + repr(config[key]) + ', use true or false')
+
+	if not is_number(config['frames_per_year']) or config['frames_per_year'] <= 0:
+		errors.append('frames_per_year is ' + repr(config['frames_per_year']) + ', use a number above 0')
+
+	if not is_number(config['pause_time']) or config['pause_time'] < 0:
+		errors.append('pause_time is ' + repr(config['pause_time']) + ', use a number of 0 or more')
+
+	# mp4 frames are streamed to ffmpeg (render.open_video)
+	if config['output'] == 'mp4' and shutil.which('ffmpeg') is None:
+		errors.append("output is 'mp4' but ffmpeg was not found, install ffmpeg or use output 'png'")
+
+	if config['rates'] in ('tract', 'legacy') and config['method'] == 'areal':
+		errors.append("rates '" + config['rates'] + "' does not work with method 'areal', which moves counts")
+
+	for key in ['variable', 'population', 'grid']:
+		if not isinstance(config[key], str):
+			errors.append(key + ' is ' + repr(config[key]) + ', use a name')
+
+	for key in ['label', 'video_file']:
+		if config[key] is not None and not isinstance(config[key], str):
+			errors.append(key + ' is ' + repr(config[key]) + ', use a string')
+
+	# grid file or raster<n>
+	grid = config['grid']
+	if isinstance(grid, str):
+		if grid.startswith('raster'):
+			if not grid[len('raster'):].isdigit() or int(grid[len('raster'):]) < 2:
+				errors.append("grid '" + grid + "' is not raster<n> with n of 2 or more")
+		elif not os.path.exists(os.path.join(data_dir, grid)):
+			n_lat = grid[len('boundaries'):-len('.csv')]
+			if grid.startswith('boundaries') and grid.endswith('.csv') and n_lat.isdigit():
+				hint = 'make it with n_lat = ' + n_lat + ' in stl_common_locations.py'
+			else:
+				hint = 'make a boundaries<n>.csv with stl_common_locations.py'
+			errors.append("grid file '" + grid + "' is not in " + data_dir + ' (' + hint + ')')
+
+	# years in increasing order, each with a data file that has the variable and population
+	years = config['years']
+	if not isinstance(years, list) or len(years) == 0:
+		errors.append('years is ' + repr(years) + ', use a list of census years')
+		years = []
+
+	try:
+		years = [str(int(year)) for year in years]
+	except (TypeError, ValueError):
+		errors.append('years ' + repr(years) + ' are not all years')
+		years = []
+
+	if any(int(year2) <= int(year) for year, year2 in zip(years[:-1], years[1:])):
+		errors.append('years ' + ', '.join(years) + ' are not in increasing order')
+
+	for year in years:
+		filename = year_file(year)
+		if not os.path.exists(os.path.join(data_dir, filename)):
+			errors.append('no data file ' + filename + ' for ' + year)
+			continue
+
+		columns = csv_columns(filename)
+		for key in ['variable', 'population']:
+			if isinstance(config[key], str) and config[key] not in columns:
+				errors.append(key + " '" + config[key] + "' is not a column of " + filename)
+
+		if not has_shapes(filename):
+			errors.append('no tract shapes in ' + filename + ' to place the values of ' + year + ' on the map')
+
+	if len(errors) != 0:
+		raise ValueError('invalid render config:\n  ' + '\n  '.join(errors))
+
+	config['years'] = years
+
+	if config['output'] == 'none':
+		config['output'] = None
+
+	if config['label'] is None:
+		config['label'] = config['variable'].title()
+		if config['variable'] in percent_columns:
+			config['label'] = '% Population ' + config['variable'].title()
+
+	if config['video_file'] is None:
+		config['video_file'] = ('video/StLouis_' + config['variable'].replace(' ', '_') + '_'
+				+ config['method'] + '.mp4')
+
+	return config
+
+
+# checked config of a render from a config file (None for the defaults) and KEY=VALUE
+# settings from the command line, which replace the ones in the file
+def load_config(path=None, settings=()):
+
+	config = {}
+	if path is not None:
+		config = read_config_file(path)
+
+	if not isinstance(config, dict):
+		raise ValueError('the config file ' + path + ' does not hold a table of settings')
+
+	for text in settings:
+		key, value = parse_setting(text)
+		config[key] = value
+
+	return validate_config(config)
@@ -0,0 +1,189 @@
+# St. Louis Neighborhoods and tracts
+# timers and counters for the stages of the mapping scripts (load, parse, idw, frames, draw,
+# encode) and a json report of the run with the totals, frame time percentiles and peak memory
+# with profiling on, every outermost stage also runs under cProfile and the profile of the
+# slowest stage is saved next to the report
+
+
+############################
+## Imports
+############################
+
+import contextlib
+import cProfile
+import time
+import json
+import sys
+import os
+
+# peak memory comes from getrusage, which is not available on Windows
+try:
+	import resource
+	use_resource = True
+except ImportError:
+	use_resource = False
+
+
+############################
+## Constants
+############################
+
+# reports are written with the other cached data unless a file is given
+report_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'reports')
+
+# timings of this run, stages hold the total seconds and calls of each stage
+report = {'start': time.perf_counter(), 'stages': {}, 'counters': {}, 'frame_times': [], 'profiles': None}
+
+# names of the stages being timed, inner stages are timed but not profiled
+active_stages = []
+
+
+############################
+## Functions
+############################
+
+# start the timings of a run, profile=True runs every outermost stage under cProfile
+def start_report(profile=False):
+
+	report['start'] = time.perf_counter()
+	report['stages'] = {}
+	report['counters'] = {}
+	report['frame_times'] = []
+	report['profiles'] = {} if profile else None
+
+
+# time the code in a with block as stage name, stages can be nested (the totals of the outer
+# stage include the inner ones)
+@contextlib.contextmanager
+def stage(name):
+
+	profiler = None
+	if report['profiles'] is not None and len(active_stages) == 0:
+		profiler = report['profiles'].setdefault(name, cProfile.Profile())
+		profiler.enable()
+
+	active_stages.append(name)
+	start = time.perf_counter()
+
+	try:
+		yield
+
+	finally:
+		elapsed = time.perf_counter() - start
+		active_stages.pop()
+
+		if profiler is not None:
+			profiler.disable()
+
+		stage_time = report['stages'].setdefault(name, {'total': 0.0, 'calls': 0})
+		stage_time['total'] = stage_time['total'] + elapsed
+		stage_time['calls'] = stage_time['calls'] + 1
+
+
+# add num to the counter name (e.g. frames drawn, years loaded)
+def count(name, num=1):
+
+	report['counters'][name] = report['counters'].get(name, 0) + num
+
+
+# record the time in seconds of one video frame
+def frame_done(seconds):
+
+	report['frame_times'].append(seconds)
+
+
+# stage times, counters and frame times since the last call, for a worker process to send
+# back with its results (see merge_timings)
+def take_timings():
+
+	timings = {'stages': report['stages'], 'counters': report['counters'],
+			'frame_times': report['frame_times']}
+
+	report['stages'] = {}
+	report['counters'] = {}
+	report['frame_times'] = []
+
+	return timings
+
+
+# add the timings of a worker process to this run, the stage totals are summed over the workers
+def merge_timings(timings):
+
+	for name, worker_time in timings['stages'].items():
+		stage_time = report['stages'].setdefault(name, {'total': 0.0, 'calls': 0})
+		stage_time['total'] = stage_time['total'] + worker_time['total']
+		stage_time['calls'] = stage_time['calls'] + worker_time['calls']
+
+	for name, num in timings['counters'].items():
+		count(name, num)
+
+	report['frame_times'].extend(timings['frame_times'])
+
+
+# peak resident memory in MB of this process and of its finished child processes (workers)
+def peak_rss_mb():
+
+	if not use_resource:
+		return None, None
+
+	# kilobytes on Linux, bytes on macOS
+	scale = 1024.0
+	if sys.platform == 'darwin':
+		scale = 1024.0*1024.0
+
+	return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+			resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+# percentiles of the frame times in milliseconds
+# numpy is imported here, the timers are used by modules that load without it
+def frame_summary(frame_times):
+
+	if len(frame_times) == 0:
+		return {'frames': 0}
+
+	import numpy as np
+
+	ms = 1000.0*np.asarray(frame_times)
+
+	return {'frames': len(ms), 'mean': float(ms.mean()), 'p50': float(np.percentile(ms, 50)),
+			'p90': float(np.percentile(ms, 90)), 'p99': float(np.percentile(ms, 99)), 'max': float(ms.max())}
+
+
+# write the report of the run as json, report_file None writes cache/reports/<script>_<time>.json
+# stage totals of frame workers are summed over the workers, so their share can be above 1
+# returns the report file
+def write_report(script, report_file=None):
+
+	if report_file is None:
+		name = os.path.splitext(os.path.basename(script))[0] + '_' + time.strftime('%Y%m%d_%H%M%S')
+		report_file = os.path.join(report_dir, name + '.json')
+
+	if os.path.dirname(report_file) != '':
+		os.makedirs(os.path.dirname(report_file), exist_ok=True)
+
+	total = time.perf_counter() - report['start']
+	peak_rss, children_peak_rss = peak_rss_mb()
+
+	stages = {}
+	for name, stage_time in sorted(report['stages'].items(), key=lambda item: -item[1]['total']):
+		stages[name] = {'total': stage_time['total'], 'calls': stage_time['calls'],
+				'share': stage_time['total'] / total}
+
+	run = {'script': os.path.basename(script), 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+			'total': total, 'stages': stages, 'counters': report['counters'],
+			'frame_ms': frame_summary(report['frame_times']),
+			'peak_rss_mb': peak_rss, 'workers_peak_rss_mb': children_peak_rss, 'profile': None}
+
+	# profile of the slowest profiled stage, read with python -m pstats <file>
+	if report['profiles']:
+		slowest = max(report['profiles'], key=lambda name: report['stages'][name]['total'])
+		run['profile'] = os.path.splitext(report_file)[0] + '_' + slowest.replace(' ', '_') + '.prof'
+		report['profiles'][slowest].dump_stats(run['profile'])
+
+	with open(report_file, 'w') as f:
+		json.dump(run, f, indent=1)
+
+	print('run report: ' + report_file)
+
+	return report_file
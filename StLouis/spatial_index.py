@@ -0,0 +1,80 @@
+# St. Louis Neighborhoods and tracts
+# spatial indexes over the tract geometries
+# built once per census year and shared by the interpolation and any proximity analysis
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+
+
+############################
+## Constants
+############################
+
+# radius of Earth in meters in St. Louis at 142 meters above sea level
+R_earth = 6369988
+
+
+############################
+## Functions
+############################
+
+# longitude and latitude in degrees to 3-D points on the unit sphere
+# the straight line (chord) distance between the points grows with the great circle
+# distance, so the nearest neighbors in 3-D are the nearest neighbors on the sphere
+def unit_sphere_xyz(xy):
+
+	xy = np.asarray(xy, dtype=float)
+	lon = np.radians(xy[:, 0])
+	lat = np.radians(xy[:, 1])
+
+	return np.column_stack([np.cos(lat)*np.cos(lon), np.cos(lat)*np.sin(lon), np.sin(lat)])
+
+
+# kd-tree over the tract centroids, (n, 2) array of longitude and latitude
+def build_centroid_index(tract_xy):
+
+	return cKDTree(unit_sphere_xyz(tract_xy))
+
+
+# k nearest tracts for every point in xy
+# returns the great circle distances in meters and the tract positions, both (points, k)
+def nearest_tracts(index, xy, k=4):
+
+	k = min(k, index.n)
+
+	# a list of k always gives two dimensional results, even for k = 1
+	chord, tract_pos = index.query(unit_sphere_xyz(xy), k=list(range(1, k+1)), workers=-1)
+
+	dist = 2.0 * R_earth * np.arcsin(np.minimum(chord / 2.0, 1.0))
+
+	return dist, tract_pos
+
+
+# position of the tract containing each point in xy, (n, 2) array of longitude and latitude
+# points inside more than one (overlapping) tract take the lowest tract position and points
+# outside every tract take the nearest tract, so the result never depends on the point order
+def assign_points_to_tracts(tract_geoms, xy):
+
+	tract_geoms = np.asarray(tract_geoms)
+	points = shapely.points(np.asarray(xy, dtype=float))
+	tree = shapely.STRtree(tract_geoms)
+
+	# start every point as unassigned (one past the last tract)
+	tract_pos = np.full(len(points), len(tract_geoms))
+
+	point_ind, tract_ind = tree.query(points, predicate='within')
+	np.minimum.at(tract_pos, point_ind, tract_ind)
+
+	# points outside every tract (river edge, gaps between tract shapes)
+	outside = np.flatnonzero(tract_pos == len(tract_geoms))
+	if len(outside) != 0:
+		point_ind, tract_ind = tree.query_nearest(points[outside], all_matches=True)
+		np.minimum.at(tract_pos, outside[point_ind], tract_ind)
+
+	return tract_pos
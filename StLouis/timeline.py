@@ -0,0 +1,212 @@
+# St. Louis Neighborhoods and tracts
+# box values over the whole census timeline for the videos
+# every year is stacked into one (years x boxes) matrix and evaluated at the frame times,
+# with a monotone cubic (PCHIP) through all years or straight lines between adjacent years
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+from scipy.interpolate import PchipInterpolator
+from interpolation import linear_steps
+from run_report import stage
+
+
+############################
+## Constants
+############################
+
+# frames for every year between two census years (1930 to 1940 gives 10 x frames_per_year)
+frames_per_year = 20
+
+# number of consecutive frames handed to a worker at once
+chunk_frames = 25
+
+
+############################
+## Functions
+############################
+
+# census years as numbers and the box values of every year as a (years, boxes) matrix
+def stack_years(years, year_colors):
+
+	times = np.array([float(year) for year in years])
+	matrix = np.vstack([np.asarray(year_colors[year], dtype=float) for year in years])
+
+	return times, matrix
+
+
+# frame times (years as decimals) of every year, one array per year starting with the year
+# itself and going up to the next year at frames_per_year, the last year only has its own frame
+# the total number of frames is frames_per_year x (last year - first year) + 1
+# the 'legacy' timeline keeps the frames of the original video, the year itself and then
+# frames_per_year frames per year spread evenly between the two years (one more per pair)
+def frame_times(times, frames_per_year=frames_per_year, interpolate=True, method='pchip'):
+
+	year_times = []
+
+	for ind, time in enumerate(times):
+
+		if interpolate and ind < len(times)-1:
+			diff = times[ind+1] - time
+			steps = int(round(diff * frames_per_year))
+
+			if method == 'legacy':
+				between = time + (np.arange(steps) + 1) * diff / (steps + 1)
+				year_times.append(np.concatenate(([time], between)))
+			else:
+				year_times.append(time + np.arange(steps) / float(frames_per_year))
+
+		else:
+			year_times.append(np.array([time]))
+
+	return year_times
+
+
+# number of video frames for the years, the frames of every year and the Delmar frame at the end
+def frame_count(years, frames_per_year=frames_per_year, interpolate=True, method='pchip'):
+
+	times = np.array([float(year) for year in years])
+	year_times = frame_times(times, frames_per_year, interpolate=interpolate, method=method)
+
+	return sum(len(ts) for ts in year_times) + 1
+
+
+# matrix with the missing (NaN) values of every box filled in from its known years, on a
+# straight line between the known years on either side and the nearest known value past
+# the first or last one, boxes without any known year are 0
+# boxes missing the same years are filled together
+def fill_missing(times, matrix):
+
+	missing = np.isnan(matrix)
+	filled = np.where(missing, 0.0, matrix)
+
+	cols = np.flatnonzero(missing.any(axis=0))
+	patterns, group = np.unique(missing[:, cols].T, axis=0, return_inverse=True)
+	group = group.ravel()
+
+	for ind, pattern in enumerate(patterns):
+		known = ~pattern
+		if not known.any():
+			continue
+
+		group_cols = cols[group == ind]
+		known_times = times[known]
+		ts = np.clip(times[pattern], known_times[0], known_times[-1])
+		filled[np.ix_(pattern, group_cols)] = linear_timeline(known_times, matrix[np.ix_(known, group_cols)], ts)
+
+	return filled
+
+
+# frames of the boxes without a value at the times ts, (times, boxes) bool
+# a box is missing at its missing years and between them and the years on either side, like
+# the straight lines of the 'linear' timeline
+def missing_frames(times, missing, ts):
+
+	ts = np.asarray(ts, dtype=float)
+
+	ind = np.clip(np.searchsorted(times, ts, side='right') - 1, 0, len(times)-1)
+	after = np.minimum(ind+1, len(times)-1)
+	between = ts > times[ind]
+
+	return missing[ind] | (missing[after] & between[:, np.newaxis])
+
+
+# box values over the timeline as a dict with the method, times and matrix, evaluated by
+# timeline_values
+# 'pchip' is a monotone cubic through the values of all years, so there are no kinks at the
+# census years and no overshoot past the values of the years on either side
+# 'linear' is a straight line between each pair of adjacent years
+# 'legacy' is the same straight lines on the frame times of the original video (see frame_times)
+# boxes without a value (NaN, e.g. outside every tract or a tract without population) are
+# fitted through their known years and are NaN again around the missing years
+# a single year has no curve, its values are the same at every time
+def build_timeline(times, matrix, method='pchip'):
+
+	if method not in ('pchip', 'linear', 'legacy'):
+		raise ValueError("unknown timeline method '" + str(method) + "', use 'pchip', 'linear' or 'legacy'")
+
+	if len(times) < 2:
+		method = 'linear'
+
+	timeline = {'method': method, 'times': times, 'matrix': matrix}
+
+	if method == 'pchip':
+		missing = np.isnan(matrix)
+		timeline['missing'] = None
+
+		if missing.any():
+			timeline['missing'] = missing
+			matrix = fill_missing(times, matrix)
+
+		timeline['spline'] = PchipInterpolator(times, matrix, axis=0)
+
+	return timeline
+
+
+# box values at the frame times ts, a (times, boxes) float32 array
+def timeline_values(timeline, ts):
+
+	if timeline['method'] == 'pchip':
+		values = timeline['spline'](ts).astype(np.float32)
+
+		if timeline['missing'] is not None:
+			values[missing_frames(timeline['times'], timeline['missing'], ts)] = np.nan
+
+		return values
+
+	return linear_timeline(timeline['times'], timeline['matrix'], ts)
+
+
+# straight line between the years on either side of each time
+def linear_timeline(times, matrix, ts):
+
+	ts = np.asarray(ts, dtype=float)
+	values = np.empty((len(ts), matrix.shape[1]), dtype=np.float32)
+
+	# year on the left of each time, the last year is the end of the line before it
+	ind = np.clip(np.searchsorted(times, ts, side='right') - 1, 0, max(len(times)-2, 0))
+
+	for year_ind in np.unique(ind):
+		at = ind == year_ind
+
+		if year_ind == len(times)-1:
+			values[at] = matrix[year_ind]
+			continue
+
+		values[at] = linear_steps(matrix[year_ind], matrix[year_ind+1],
+				times[year_ind+1] - times[year_ind], ts[at] - times[year_ind])
+
+	return values
+
+
+# split the video into chunks of consecutive frames
+# every year starts with its own frame and has frames_per_year frames until the next year,
+# the last year has its own frame and a second one with Delmar Blvd
+# a chunk is a dict with the first frame number, the year and the box values of its frames,
+# a (frames, boxes) float32 array from the timeline (see build_timeline)
+# the chunks are made lazily, the frames of a year are evaluated in one go when its first
+# chunk is needed and the chunks are views into that array
+def build_frame_chunks(years, year_colors, frames_per_year=frames_per_year, method='pchip',
+		interpolate=True, chunk_frames=chunk_frames):
+
+	times, matrix = stack_years(years, year_colors)
+	timeline = build_timeline(times, matrix, method=method)
+
+	frame = 1
+
+	for year, ts in zip(years, frame_times(times, frames_per_year, interpolate=interpolate, method=method)):
+
+		with stage('frame values'):
+			year_values = timeline_values(timeline, ts)
+
+		for start in range(0, len(ts), chunk_frames):
+			chunk = {'frame': frame, 'year': year, 'delmar': False,
+					'values': year_values[start:start+chunk_frames]}
+			yield chunk
+			frame = frame + len(chunk['values'])
+
+	# add a frame to show Delmar divide after the last year
+	yield dict(chunk, frame=frame, delmar=True)
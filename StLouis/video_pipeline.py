@@ -0,0 +1,115 @@
+# St. Louis Neighborhoods and tracts
+# the steps of a video from its settings (render_config.validate_config): box values of
+# every year, the frames in between, the frame store and the rendering
+# run by the video scripts with the settings at their top and by python -m StLouis render
+# matplotlib and the drawing code are only imported once the frames are ready to draw, a
+# render that already finished stops before anything is loaded
+
+
+############################
+## Imports
+############################
+
+import os
+from data_loader import data_dir, year_file
+from year_values import preprocess_years
+from box_grid import load_grid, grid_xy, grid_geoms
+from timeline import frame_count, build_frame_chunks
+from frame_store import frame_store_key, frame_source_key, open_frame_store, render_finished, resume_chunks
+from run_report import stage
+
+
+############################
+## Functions
+############################
+
+# data files the box values of config are read from, the census years and the box grid
+# (the city boundary for a raster grid)
+def source_files(config):
+
+	grid_file = config['grid']
+	if grid_file.startswith('raster'):
+		grid_file = 'stl_boundary.csv'
+
+	return [os.path.join(data_dir, filename) for filename in [grid_file] + [year_file(year) for year in config['years']]]
+
+
+# render the video of config, preview shows the frames while drawing them (one worker only)
+# and restart starts the render again instead of resuming
+def render_video(config, preview=False, restart=False):
+
+	pause_time = None
+	if preview:
+		pause_time = config['pause_time']
+
+	# a finished render with the same frame values and drawing settings is not done again
+	video_file = config['video_file']
+	store_name = os.path.splitext(os.path.basename(video_file))[0]
+	source = frame_source_key([config[key] for key in ['grid', 'years', 'variable', 'population', 'method',
+			'rates', 'lowest_vals', 'frames_per_year', 'timeline', 'interpolate']], source_files(config))
+	render_settings = [config['label'], config['fps'], config['dpi'], config['redraw_frames']]
+
+	if (config['resume'] and not preview and not restart
+			and render_finished(store_name, source, config['output'], video_file, render_settings)):
+		done = video_file + ' is up to date'
+		if config['output'] == 'png':
+			done = 'the frames in video/ are up to date'
+		print(done + ', use --restart to render again')
+		return
+
+	# read in the boundaries of the small boxes
+	with stage('load'):
+		boxes_data = load_grid(config['grid'])
+
+	# box centers only need to be calculated once for all years
+	box_xy = grid_xy(boxes_data)
+
+	box_geoms = None
+	if config['method'] == 'areal':
+		box_geoms = grid_geoms(boxes_data)
+
+	# box colors of every year, the years are prepared by year_workers processes at once
+	years = config['years']
+	with stage('years'):
+		year_matrix = preprocess_years(years, config['grid'], box_xy, method=config['method'],
+				workers=config['year_workers'], name_dem=config['variable'], name_pop=config['population'],
+				rates=config['rates'], lowest_vals=config['lowest_vals'], box_geoms=box_geoms)
+	year_colors = dict(zip(years, year_matrix))
+
+	# the frames of every year and the frames in between from the timeline of all years
+	frame_chunks = build_frame_chunks(years, year_colors, frames_per_year=config['frames_per_year'],
+			method=config['timeline'], interpolate=config['interpolate'])
+
+	# frame values on disk (only calculated when the years or settings change) and the frames
+	# not rendered yet, numbered from 1 like the png files
+	store = None
+	if config['resume']:
+		store_key = frame_store_key(years, year_colors, [config['grid'], config['frames_per_year'],
+				config['timeline'], config['interpolate']])
+		store = open_frame_store(store_name, store_key, frame_chunks,
+				frame_count(years, config['frames_per_year'], config['interpolate'], config['timeline']),
+				len(box_xy), source=source)
+		frame_chunks = resume_chunks(store, config['output'], video_file, restart=restart,
+				settings=render_settings)
+
+	# headless unless the frames are shown
+	import matplotlib
+	if not preview:
+		matplotlib.use('Agg')
+
+	import matplotlib.pyplot as plt
+	from render import render_frames, render_frames_parallel
+
+	if config['workers'] > 1:
+		render_frames_parallel(frame_chunks, config['grid'], config['label'], workers=config['workers'],
+				output_format=config['output'], video_file=video_file, store=store,
+				fps=config['fps'], dpi=config['dpi'])
+
+	else:
+		render_frames(frame_chunks, boxes_data, config['label'], output_format=config['output'],
+				video_file=video_file, pause_time=pause_time, redraw_frames=config['redraw_frames'],
+				store=store, fps=config['fps'], dpi=config['dpi'])
+
+		if preview:
+			plt.pause(2)
+		plt.close()
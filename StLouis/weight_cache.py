@@ -0,0 +1,101 @@
+# St. Louis Neighborhoods and tracts
+# box x tract weight matrices (inverse distance or area) cached on disk for each tract boundary vintage
+# years with the same tract shapes (e.g. the ACS years 2010 to 2018) share one matrix
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+import shapely
+import hashlib
+import os
+from scipy.sparse import load_npz, save_npz
+from interpolation import centroid_xy, idw_weight_matrix
+from spatial_index import build_centroid_index
+from areal_interpolation import areal_weight_matrix
+
+
+############################
+## Constants
+############################
+
+# weight matrices are written next to the data files
+cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+# matrices already loaded in this run, by cache file name
+loaded_weights = {}
+
+
+############################
+## Functions
+############################
+
+# hash of the box centers and the tract shapes, any change to either gives a new matrix
+def weights_key(box_xy, data, method):
+
+	h = hashlib.sha1()
+	h.update(method.encode())
+	h.update(np.ascontiguousarray(box_xy, dtype=float).tobytes())
+
+	for tract_wkb in shapely.to_wkb(np.asarray(data['geometry'].values)):
+		h.update(tract_wkb)
+
+	return h.hexdigest()[:16]
+
+
+# weight matrix called name from this run, the cache or calculated by compute() and saved
+def cached_weights(name, compute):
+
+	if name in loaded_weights:
+		return loaded_weights[name]
+
+	path = os.path.join(cache_dir, name)
+
+	if os.path.exists(path):
+		weights = load_npz(path)
+
+	else:
+		weights = compute()
+
+		# write a copy and rename it, years with the same tracts done by different
+		# processes at the same time never read half a file
+		os.makedirs(cache_dir, exist_ok=True)
+		part = path[:-len('.npz')] + '.' + str(os.getpid()) + '.part.npz'
+		save_npz(part, weights)
+		os.replace(part, path)
+
+	loaded_weights[name] = weights
+
+	return weights
+
+
+# name of the cached matrix of a method for the boxes of boxes_file and the tracts in data
+def weights_name(method, boxes_file, box_xy, data):
+
+	grid_name = os.path.splitext(os.path.basename(boxes_file))[0]
+
+	return method + '_' + grid_name + '_' + weights_key(box_xy, data, method) + '.npz'
+
+
+# inverse distance weight matrix for the boxes of boxes_file and the tracts in data
+# read from the cache if the same grid and tract shapes were interpolated before
+def cached_idw_weights(boxes_file, box_xy, data, lowest_vals=4, power=2):
+
+	def compute():
+		tract_xy = centroid_xy(data)
+		return idw_weight_matrix(box_xy, tract_xy, lowest_vals=lowest_vals, power=power,
+				index=build_centroid_index(tract_xy))
+
+	return cached_weights(weights_name('idw_' + str(lowest_vals) + '_' + str(power), boxes_file, box_xy, data), compute)
+
+
+# area weight matrix (areal_interpolation.areal_weight_matrix) for the boxes of boxes_file,
+# with their polygons box_geoms, and the tracts in data
+def cached_areal_weights(boxes_file, box_xy, box_geoms, data):
+
+	def compute():
+		return areal_weight_matrix(box_geoms, np.asarray(data['geometry'].values))
+
+	return cached_weights(weights_name('areal', boxes_file, box_xy, data), compute)
@@ -0,0 +1,195 @@
+# St. Louis Neighborhoods and tracts
+# box values of every census year before the frames are drawn
+# the years do not depend on each other, so they are read, parsed and moved onto the boxes
+# by a pool of processes, one year per task, and stacked in the order of the years
+
+
+############################
+## Imports
+############################
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import sys
+import os
+from data_loader import load_year
+from interpolation import apply_weights, apply_rate_weights, assignment_matrix
+from weight_cache import cached_idw_weights, cached_areal_weights
+from spatial_index import assign_points_to_tracts
+from run_report import stage, start_report, take_timings, merge_timings
+
+
+############################
+## Constants
+############################
+
+# box centers and settings of a year worker process
+worker_state = {}
+
+# the year and frame workers are forked, which Windows does not have and is not safe on
+# macOS (system libraries with threads), there the years and frames are done in this process
+use_fork = 'fork' in multiprocessing.get_all_start_methods() and sys.platform != 'darwin'
+
+# columns counting people or households, divided by name_pop to give a rate, the other
+# columns (e.g. income per capita) are values of the tract averaged by population
+count_columns = ['population', 'white', 'black', 'people of color', 'households']
+
+
+############################
+## Functions
+############################
+
+# box values of one census year, the demographic rate of the tracts (name_dem / name_pop)
+# moved onto the boxes by method
+# name_dem is a column or a list of columns (e.g. ['white', 'black', 'income per capita']),
+# which all go through the same weights at once and give a (boxes, columns) array
+#   'idw': inverse distance weights of the lowest_vals nearest tract centroids (cached on disk)
+#   'assign': the value of the tract each box center is in
+#   'areal': the tract counts split between the boxes by area (box_geoms are the box
+#       polygons, box_grid.grid_geoms), boxes outside every tract have no people and are
+#       NaN (drawn empty)
+# rates is
+#   'population': the name_dem and name_pop counts go through the weights and are divided on
+#       the boxes, so small tracts do not count as much as big ones (values that are not
+#       counts are multiplied by name_pop first, a population weighted average)
+#   'tract': the weights average the tract rates, not for 'areal' which moves counts
+#   'legacy': the weights average the tract rates like the original scripts, a tract
+#       without people (0 / 0) keeps its weight and adds nothing, pulling its boxes toward 0
+# a tract without people has no rate and is left out by 'population' and 'tract', boxes with
+# only such tracts (or outside every tract for 'areal') are NaN, the timeline keeps them empty
+# return_population=True also returns the name_pop values of the boxes, the population of
+# the box area for 'areal' and the weighted tract population for the others
+def year_box_values(year, boxes_file, box_xy, method='idw', name_dem='white', name_pop='population',
+		lowest_vals=4, box_geoms=None, rates='population', return_population=False):
+
+	if method not in ('idw', 'assign', 'areal'):
+		raise ValueError("unknown box value method '" + str(method) + "', use 'idw', 'assign' or 'areal'")
+
+	if rates not in ('population', 'tract', 'legacy') or (rates != 'population' and method == 'areal'):
+		raise ValueError("unknown rates '" + str(rates) + "' for method '" + method + "', use 'population'"
+				+ (", 'tract' or 'legacy'" if method != 'areal' else ''))
+
+	# read in the data file with the demographic colors (2010 to 2018 are ACS estimates)
+	with stage('load'):
+		data = load_year(year, name_pop=name_pop)
+
+	# 1910 and 1920 only have the ward values, without shapes to place them
+	if data.geometry.isna().all():
+		raise ValueError('the ' + str(year) + ' data has no tract shapes to move onto the boxes')
+
+	if method == 'idw':
+		# inverse distance weights of the nearest tracts for all boxes, shared by years with the same tracts
+		with stage('idw'):
+			box_weights = cached_idw_weights(boxes_file, box_xy, data, lowest_vals=lowest_vals)
+
+	elif method == 'areal':
+		# share of the tract areas in every box, shared by years with the same tracts
+		with stage('areal'):
+			box_weights = cached_areal_weights(boxes_file, box_xy, box_geoms, data)
+
+	else:
+		# assign every box center to the tract it is in (nearest tract if outside every tract)
+		with stage('assign'):
+			box_weights = assignment_matrix(assign_points_to_tracts(data.geometry.values, box_xy), len(data))
+
+	names = [name_dem] if isinstance(name_dem, str) else list(name_dem)
+	counts = np.isin(names, count_columns)
+
+	tract_vals = data[names].values.astype(float)
+	tract_pop = data[name_pop].values.astype(float)[:, np.newaxis]
+
+	with stage('rates'):
+		if rates in ('tract', 'legacy'):
+			with np.errstate(invalid='ignore', divide='ignore'):
+				tract_vals = np.where(counts, tract_vals / tract_pop, tract_vals)
+
+			# average of the known tract rates, the weight of a tract without a rate is left out
+			# unless it is the legacy average
+			if rates == 'legacy':
+				vals = apply_weights(box_weights, tract_vals)
+			else:
+				vals = apply_rate_weights(box_weights, tract_vals, np.ones(len(tract_vals)))[0]
+
+			population = apply_weights(box_weights, tract_pop[:, 0])
+
+		else:
+			vals, population = apply_rate_weights(box_weights, np.where(counts, tract_vals, tract_vals*tract_pop),
+					tract_pop[:, 0], normalize=(method != 'areal'))
+
+	if isinstance(name_dem, str):
+		vals = vals[:, 0]
+
+	if return_population:
+		return vals, population
+
+	return vals
+
+
+# keep the box centers and settings in every worker process
+def init_year_worker(boxes_file, box_xy, box_geoms, settings):
+
+	# the timings of the parent process before the fork are not the worker's
+	start_report()
+
+	worker_state['boxes_file'] = boxes_file
+	worker_state['box_xy'] = box_xy
+	worker_state['box_geoms'] = box_geoms
+	worker_state['settings'] = settings
+
+
+# box values of a year in a worker, with the stage timings of the year
+def year_worker(year):
+
+	vals = year_box_values(year, worker_state['boxes_file'], worker_state['box_xy'],
+			box_geoms=worker_state['box_geoms'], **worker_state['settings'])
+
+	return vals, take_timings()
+
+
+# box values of all years as a (years, boxes) array in the order of years, or a (years, boxes,
+# columns) array for a list of name_dem columns, with return_population=True a second
+# (years, boxes) array with the population of the boxes
+# workers is the number of processes (None for one per cpu, at most one per year), with one
+# worker or without fork (use_fork) the years are done in this process
+# every year is calculated the same way whichever process does it, so the values are the
+# same for any number of workers
+def preprocess_years(years, boxes_file, box_xy, method='idw', workers=None, name_dem='white',
+		name_pop='population', lowest_vals=4, box_geoms=None, rates='population', return_population=False):
+
+	settings = {'method': method, 'name_dem': name_dem, 'name_pop': name_pop, 'lowest_vals': lowest_vals,
+			'rates': rates, 'return_population': return_population}
+
+	# repeated years are only calculated once
+	unique_years = list(dict.fromkeys(years))
+
+	if workers is None:
+		workers = os.cpu_count()
+	workers = max(1, min(workers, len(unique_years)))
+
+	if not use_fork:
+		workers = 1
+
+	if workers == 1:
+		values = [year_box_values(year, boxes_file, box_xy, box_geoms=box_geoms, **settings) for year in unique_years]
+
+	else:
+		# fork so the workers do not run the calling script again on start up
+		context = multiprocessing.get_context('fork')
+
+		values = []
+		with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_year_worker,
+				initargs=(boxes_file, box_xy, box_geoms, settings)) as executor:
+
+			# results come back in the order of the years, not in the order they finish
+			for vals, timings in executor.map(year_worker, unique_years):
+				merge_timings(timings)
+				values.append(vals)
+
+	rows = {year: ind for ind, year in enumerate(unique_years)}
+
+	if return_population:
+		return (np.stack([values[rows[year]][0] for year in years]),
+				np.stack([values[rows[year]][1] for year in years]))
+
+	return np.stack([values[rows[year]] for year in years])